@@ -1,29 +1,73 @@
 import bpy
+import bmesh
 import os
-import random
-import itertools
-from time import time
+import time
+import fnmatch
+import tempfile
 
-from mathutils import Vector
+from .utils import getSelectedMeshObjects, selectActiveMaterialOnly, selectNeighbourMaterial, \
+	getVertexCoordinates, selectVerticesBeyond, offsetVertices, jitterTransforms, getMaterialFaces, \
+	loadManifest, saveManifest, getNumpy
+from .profiling import phase, profileOperators, dumpHistory, history, formatRecord
 
-from .utils import vectorMultiply, vectorLength, getSelectedMeshObjects, selectActiveMaterialOnly, selectNeighbourMaterial
+# Heavy modules (mirror, images, exporter, pool) and numpy are imported by the operators on first use,
+# so loading the add-on stays cheap.
 
 #works
-#TODO: Add more unwrap modes and options
 class VIEW3D_OT_unwrap(bpy.types.Operator):
 	bl_label = "Unwrap Materials Separately"
 	bl_idname = "view3d.unwrap_per_material"
-	bl_description = "Selects each material one by one and makes a UV-unwrap on per-material basis"
+	bl_description = "Selects each material one by one and makes a UV-unwrap on per-material basis, in every selected mesh"
 	bl_options = {'REGISTER', 'UNDO'}
 
+	unwrap_methods = (("ANGLE_BASED", "Angle Based", ""), ("CONFORMAL", "Conformal", ""),)
+
+	method = bpy.props.EnumProperty(items=unwrap_methods, name="Method", description="Unwrapping method")
+	margin = bpy.props.FloatProperty(name="Margin", default=0.001, min=0, max=1, description="Space between islands")
+
 	def execute(self, context):
-		bpy.ops.object.mode_set(mode="EDIT")
-		bpy.context.tool_settings.mesh_select_mode = (False, False, True)  # vert, edge, face
-		for i in range(len(bpy.context.object.material_slots)):
-			bpy.context.object.active_material_index = i
-			bpy.ops.object.material_slot_select()
-			bpy.ops.uv.unwrap(method='ANGLE_BASED', margin=0.001)
+		scene = context.scene
+		active_obj = scene.objects.active
+
+		# the active object gets processed even if it is not selected
+		objects = getSelectedMeshObjects()
+		if active_obj and active_obj.type == 'MESH' and active_obj not in objects:
+			objects.append(active_obj)
+
+		bpy.ops.object.mode_set(mode="OBJECT")  # mesh data is not updated in EDIT mode
+		context.tool_settings.mesh_select_mode = (False, False, True)  # vert, edge, face
+
+		done = set()
+		for obj in objects:
+			mesh = obj.data
+			if mesh.as_pointer() in done:
+				continue
+			done.add(mesh.as_pointer())
+
+			# read once for all materials. Materials without faces are skipped.
+			material_faces = getMaterialFaces(mesh)
+			material_indices = [i for i in sorted(material_faces) if i < len(obj.material_slots)]
+			if not material_indices:
+				continue
+
+			scene.objects.active = obj
+			bpy.ops.object.mode_set(mode="EDIT")
 			bpy.ops.mesh.select_all(action='DESELECT')
+			for i in material_indices:
+				# unwrap may add a UV layer, so the lookup table is refreshed every time
+				bm = bmesh.from_edit_mesh(mesh)
+				bm.faces.ensure_lookup_table()
+				faces = [bm.faces[face_index] for face_index in material_faces[i]]
+				for face in faces:
+					face.select_set(True)
+				bpy.ops.uv.unwrap(method=self.method, margin=self.margin)
+				for face in faces:
+					face.select_set(False)
+			bpy.ops.object.mode_set(mode="OBJECT")
+
+		scene.objects.active = active_obj
+		if active_obj and active_obj.type == 'MESH':
+			bpy.ops.object.mode_set(mode="EDIT")
 
 		return {'FINISHED'}
 
@@ -64,14 +108,35 @@ class VIEW3D_OT_this_material_select(bpy.types.Operator):
 	def execute(self, context):
 		bpy.ops.object.mode_set(mode="EDIT")
 		bpy.context.tool_settings.mesh_select_mode = (False, False, True)  # vert, edge, face
-		selectActiveMaterialOnly()
+		selectActiveMaterialOnly(context.object)
 
 		return {'FINISHED'}
 
-class VIEW3D_OT_mirror_weights(bpy.types.Operator):
-	bl_label = "Mirror weights"
-	bl_idname = "view3d.mirror_weights"
-	bl_description = "Mirror weights from one half to another"
+# seconds of work the interactive mirror does per timer tick, the rest is left to the interface
+MODAL_TIME_BUDGET = 0.05
+MODAL_TIMER_INTERVAL = 0.02
+# events the interactive mirror lets through, so the view can be navigated meanwhile
+NAVIGATION_EVENTS = {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'MOUSEMOVE', 'TRACKPADPAN', 'TRACKPADZOOM'}
+
+
+def stageSteps(name, steps):
+	"""
+	Passes the progress of `steps` (see `mirror.runSteps`) on as (name, progress).
+	:return: the result of `steps`
+	"""
+	while True:
+		try:
+			progress = next(steps)
+		except StopIteration as stop:
+			return stop.value
+		yield name, progress
+
+
+class MirrorWeightsMixin(object):
+	"""
+	Properties and the work of the mirror weights operators. Blender doesn't pass properties on
+	to subclasses of registered operators, so they are shared this way.
+	"""
 	bl_options = {'REGISTER', 'UNDO'}
 
 	axes_menu_items = (("x", "X", "", 0), ("y", "Y", "", 1), ("z", "Z", "", 2),)
@@ -79,212 +144,253 @@ class VIEW3D_OT_mirror_weights(bpy.types.Operator):
 	margin = bpy.props.FloatProperty(name="Margin", unit="LENGTH", subtype="NONE", soft_min=0, step=0.00001 * 100,
 									 description="The coordinate of a vertex will be checked in the interval with width of 2*margin. Needed to avoid precision problems. Should be left at default value most of the time.", default=0.00001, precision=6)
 
-	def execute(self, context):
+	def steps(self, context, backups=None):
+		"""
+		Mirrors the weights, yielding (stage name, progress of the stage) every now and then.
+		:param backups: if a list is given, the written groups are recorded in it, see `rollback`
+		:return: operator result, like `execute`
+		"""
 		active_obj = context.active_object
 		data = active_obj.data
 		axis_index = "xyz".index(context.scene.weight_mirror_axis)
 		negative = context.scene.weight_mirror_negative
+		algorithm = context.scene.weight_mirror_algorithm
 
 		# get active vertex group
 		vertex_group = active_obj.vertex_groups.active
 
-		def symmetricals(a, b):
-			"""
-			Checks whether the vertices are symmetrical along given axis or not.
-			"""
-			result = []
-			for ax in range(3):
-				if ax == axis_index:
-					result.append(abs(a[ax] + b[ax]) < self.margin)
-				else:
-					result.append(abs(a[ax] - b[ax]) < self.margin)
-
-			return all(result)
-
-		def perebor_algorithm():
-			positives = []
-			negatives = []
-
-			for vert in data.vertices:
-				vert_coords = vert.co.to_tuple()
-				if negative:
-					# negative (from -X to +X)
-					if vert_coords[axis_index] < 0:
-						# weights are copied FROM these
-						try:
-							vert_weight = vertex_group.weight(vert.index)
-						except RuntimeError:
-							continue
-						# look for symmetrical vertex among saved ones
-						for n, other_vert_index in enumerate(positives):
-							other_vert_coords = data.vertices[other_vert_index].co.to_tuple()
-							if symmetricals(other_vert_coords, vert_coords):
-								vertex_group.add((other_vert_index,), vert_weight, "REPLACE")
-								positives.pop(n)
-								break
-						else:
-							negatives.append(vert.index)
-					elif vert_coords[axis_index] > 0:
-						# weights are copied TO these
-						for n, other_vert_index in enumerate(negatives):
-							other_vert_coords = data.vertices[other_vert_index].co.to_tuple()
-							if symmetricals(other_vert_coords, vert_coords):
-								vert_weight = vertex_group.weight(other_vert_index)
-								vertex_group.add((vert.index,), vert_weight, "REPLACE")
-								negatives.pop(n)
-								break
-						else:
-							vertex_group.add((vert.index,), 0.0, "REPLACE")
-							positives.append(vert.index)
-				else:
-					# positive (from +X to -X)
-					if vert_coords[axis_index] > 0:
-						# weights are copied FROM these
-						try:
-							vert_weight = vertex_group.weight(vert.index)
-						except RuntimeError:
-							continue
-						# look for symmetrical vertex among saved ones
-						for n, other_vert_index in enumerate(negatives):
-							other_vert_coords = data.vertices[other_vert_index].co.to_tuple()
-							if symmetricals(other_vert_coords, vert_coords):
-								vertex_group.add((other_vert_index,), vert_weight, "REPLACE")
-								negatives.pop(n)
-								break
-						else:
-							positives.append(vert.index)
-					elif vert_coords[axis_index] < 0:
-						# weights are copied TO these
-						for n, other_vert_index in enumerate(positives):
-							other_vert_coords = data.vertices[other_vert_index].co.to_tuple()
-							if symmetricals(other_vert_coords, vert_coords):
-								vert_weight = vertex_group.weight(other_vert_index)
-								vertex_group.add((vert.index,), vert_weight, "REPLACE")
-								positives.pop(n)
-								break
-						else:
-							vertex_group.add((vert.index,), 0.0, "REPLACE")
-							negatives.append(vert.index)
-
-		def vector_grouper_algorithm():
-			def assignWeight(a,b):
-				"""
-				Assigns a weight from a to b. If a has no weight data, assigns 0 to b.
-				:param a:
-				:param b:
-				:return:
-				"""
-				try:
-					vert_weight = vertex_group.weight(a)
-					vertex_group.add((b,), vert_weight, "REPLACE")
-				except RuntimeError:
-					vertex_group.add((b,), 0, "REPLACE")
-
-			def searcher(A, B):
-				"""
-				Looks for symmetical vertices in A and B and assigns weight from 
-				a vertex in A to a corresponding vertex in B.
-				"""
-				for a in A:
-					coord_a = data.vertices[a].co.to_tuple()
-					for b in B:
-						coord_b = data.vertices[b].co.to_tuple()
-						if symmetricals(coord_a, coord_b):
-							assignWeight(a,b)
-
-			def getPivotOffset(preset=None):
-				axes = tuple(i for i in range(3) if i != axis_index)
-				if not preset:
-					max_a = -float("inf")
-					max_b = -float("inf")
-					for vert in data.vertices:
-						vert_coords = vert.co
-						if vert_coords[axes[0]] > max_a:
-							max_a = vert_coords[axes[0]]
-						if vert_coords[axes[1]] > max_b:
-							max_b = vert_coords[axes[1]]
-
-					result = [max_a, max_b]
-					result.insert(axis_index, 0)
-
-					return Vector(result)
-				else:
-					result = preset.copy()
-					result[axis_index] = 0
-					return result
-
-			pivot_offset = getPivotOffset()
-
-			verts = data.vertices
-			verts_len = len(verts)
-			verts_len_old = float("inf")
-			resolution = 2**context.scene.weight_mirror_resolution  # resolution
-			print("len(verts)",len(tuple(verts)))#debug
-
-			while verts_len and verts_len < verts_len_old:
-				print("pivot_offset",pivot_offset)#debug
-				# grouping by position vector lengths
-				vec_distrib = dict()
-				for vert in verts:
-					vert_coords = vert.co.to_tuple()
-					l = vectorLength(vert.co, pivot_offset, return_square=True)
-					key = round(l*resolution)
-					group_index = 0 if vert_coords[axis_index] < 0 else 1  # positive or negative
-					vec_distrib.setdefault(key, ([], []))[group_index].append(vert.index)
-
-				for i, v in vec_distrib.copy().items():
-					negatives = v[0]
-					positives = v[1]
-
-					# perfectly distributed!
-					if len(negatives) == len(positives) == 1:
-						if negative:
-							assignWeight(negatives[0], positives[0])
-						else:
-							assignWeight(positives[0], negatives[0])
-
-						del vec_distrib[i]
-
-					# it is either a vertex with x==0, or a vertex that accidentally fell out.
-					elif (len(negatives) == 1 and len(positives) == 0) or (len(negatives) == 0 and len(positives) == 1):
-						# a vert in 0
-						if abs(data.vertices[(negatives + positives)[0]].co[axis_index]) < self.margin:
-							# just skip it
-							del vec_distrib[i]
-
-				verts = tuple(data.vertices[i] for i in itertools.chain.from_iterable(itertools.chain.from_iterable(vec_distrib.values())))
-				verts_len_old = verts_len
-				verts_len = len(verts)
-				try:
-					pivot_offset = getPivotOffset(preset=verts[0].co)
-				except IndexError:
-					# end. All verts are arranged!
-					pass
-				print("Iteration complete. Remaining vertices:", verts_len)
-
-				# print("vec_distrib",vec_distrib)#debug
-				# print(set((len(vec_distrib[i][0]), len(vec_distrib[i][1]),) for i in vec_distrib))#debug
-				# print(list(itertools.chain.from_iterable(itertools.chain.from_iterable(vec_distrib.values()))))#debug
-
-		start_time = time()
-		if vertex_group:
-			if context.scene.weight_mirror_algorithm == "perebor":
-				perebor_algorithm()
-			elif context.scene.weight_mirror_algorithm == "vector_grouper":
-				vector_grouper_algorithm()
+		all_groups = context.scene.weight_mirror_all_groups
+		if all_groups:
+			group_filter = context.scene.weight_mirror_group_filter
+			groups = [group for group in active_obj.vertex_groups
+					  if not group_filter or fnmatch.fnmatchcase(group.name, group_filter)]
 		else:
+			groups = [vertex_group] if vertex_group else []
+
+		if not vertex_group:
 			print("Object has no vertex groups!")
 			self.report({'ERROR'}, 'Object has no vertex groups!')
-
-		print("Time elapsed:", time()-start_time)
+			return {'FINISHED'}
+
+		if not groups:
+			self.report({'WARNING'}, 'No vertex groups match the filter!')
+			return {'CANCELLED'}
+
+		np = getNumpy()
+		if algorithm == "quantized" and np is None:
+			self.report({'ERROR'}, 'Quantized algorithm requires NumPy!')
+			return {'CANCELLED'}
+
+		from . import kernels
+		from .weights import readGroups, writeGroup, GROUP_VERTEX_BYTES
+		from .mirror import mirroredGroupName, hasSideToken, spatialHashSteps, pereborSteps, vectorGrouperSteps, quantizedPairs, \
+			chunkedSteps, topologySteps, geometryHash, pairMapBytes, pair_cache, STEP_SIZE
+
+		with phase("extraction"):
+			coords = getVertexCoordinates(data)
+			edges = kernels.readIndices(data.edges, "vertices", 2) if algorithm == "topology" else None
+			resolution = 2**context.scene.weight_mirror_resolution
+			memory_limit = context.scene.weight_mirror_memory_limit * 1024 * 1024
+			cache_key = (data.name, geometryHash(coords, len(data.edges), len(data.polygons), edges),
+						 algorithm, axis_index, self.margin, negative,
+						 {"vector_grouper": resolution, "chunked": memory_limit}.get(algorithm))
+			result = pair_cache.get(cache_key)
+			stats = None
+
+		with phase("matching"):
+			if result is not None:
+				self.report({'INFO'}, "Using cached symmetry map")
+			else:
+				if algorithm == "quantized":
+					# vectorized, it takes a moment anyway
+					result = quantizedPairs(coords, axis_index, self.margin, negative)
+				elif algorithm == "chunked":
+					stats = dict()
+					result = yield from stageSteps("matching", chunkedSteps(coords, axis_index, self.margin, negative, memory_limit, stats=stats))
+				else:
+					# pure python algorithms are faster on lists than on arrays
+					vectors = coords
+					coords = kernels.toList(coords)
+					if algorithm == "perebor":
+						result = yield from stageSteps("matching", pereborSteps(coords, axis_index, self.margin, negative))
+					elif algorithm == "vector_grouper":
+						stats = dict()
+						result = yield from stageSteps("matching", vectorGrouperSteps(coords, axis_index, self.margin, negative, resolution,
+																												  stats=stats, vectors=vectors))
+						self.report({'INFO'}, "Vector-grouper passes: {0}, paired by fallback: {1}".format(
+							len(stats["remaining"]), stats["fallback_pairs"]))
+					elif algorithm == "topology":
+						stats = dict()
+						result = yield from stageSteps("matching", topologySteps(coords, edges, axis_index, self.margin, negative, stats=stats))
+						self.report({'INFO'}, "Topology pairs: {0}, told apart by coordinates: {1}, anchored by coordinates: {2}".format(
+							stats["topology_pairs"], stats["coordinate_pairs"], stats["anchor_pairs"]))
+					else:
+						result = yield from stageSteps("matching", spatialHashSteps(coords, axis_index, self.margin, negative))
+				# a copy of a map larger than that would break the memory limit of the chunked search
+				if algorithm != "chunked" or 2 * pairMapBytes(result) <= memory_limit:
+					pair_cache.put(cache_key, result)
+		sources, targets, unmatched_sources, unmatched_targets = result
+
+		with phase("writing"):
+			all_targets = targets + unmatched_targets if backups is not None else None
+			skipped = []
+			# (backup slices, target group index) of the groups that existed before
+			recorded = []
+
+			# (source group index, target group) of every group to mirror
+			writes = []
+			for group in groups:
+				# weights of "hand.L" go to "hand.R" and vice versa. Groups without a side are mirrored onto themselves.
+				counterpart_name = mirroredGroupName(group.name) if all_groups else None
+				created = False
+				if counterpart_name is None and all_groups and hasSideToken(group.name):
+					# mirroring a one-sided group onto itself would overwrite its other half
+					skipped.append(group.name)
+					continue
+				if counterpart_name is None:
+					target_group = group
+				else:
+					target_group = active_obj.vertex_groups.get(counterpart_name)
+					if target_group is None:
+						target_group = active_obj.vertex_groups.new(name=counterpart_name)
+						created = True
+
+				if backups is not None:
+					slices = []
+					backups.append((target_group.name, created, slices))
+					if not created:
+						recorded.append((slices, target_group.index))
+				writes.append((group.index, target_group))
+
+			# the weights are read and written in slices of `STEP_SIZE` vertices, so the interactive operator
+			# stays responsive and the chunked search stays within its memory limit
+			step = STEP_SIZE
+
+			# the old weights of the target side, all the groups in one pass per slice
+			for start in range(0, len(all_targets) if recorded else 0, step):
+				yield "backup", start / len(all_targets)
+				indices = all_targets[start:start + step]
+				old_weights = readGroups(data, [group_index for slices, group_index in recorded], indices)
+				for slices, group_index in recorded:
+					slices.append((indices, old_weights[group_index]))
+
+			# the correspondence is the same for every group, so it is applied to all of them
+			for start in range(0, len(sources), step):
+				yield "writing", start / len(sources)
+				# the weights of all the groups at the source vertices, in one pass
+				source_weights = readGroups(data, [index for index, target_group in writes], sources[start:start + step])
+				for n, (index, target_group) in enumerate(writes):
+					yield "writing", (start + step * n / len(writes)) / len(sources)
+					# targets of the vertices outside of the group leave it too
+					weights, mask = source_weights[index]
+					writeGroup(target_group, targets[start:start + step], weights, mask)
+
+			# no symmetrical vertex, so nothing to mirror from
+			if len(unmatched_targets):
+				for index, target_group in writes:
+					yield "writing", 1.0
+					target_group.remove(list(unmatched_targets))
+
+		if algorithm == "chunked" and stats is not None:
+			# the symmetry map is kept while the weights are written, slice by slice
+			peak_bytes = max(stats["peak_bytes"], pairMapBytes(result) + min(step, len(sources)) * GROUP_VERTEX_BYTES * len(writes))
+			self.report({'INFO'}, "Searched in {0} chunks, peak memory about {1:.1f} MB".format(
+				stats["chunks"], peak_bytes / 1024.0 / 1024.0))
+
+		if skipped:
+			self.report({'WARNING'}, "Skipped groups with a side that can't be flipped: " + ", ".join(skipped))
+
+		if unmatched_sources or unmatched_targets:
+			message = "Vertices without symmetrical pair: {0} on the source side, {1} on the target side".format(
+				len(unmatched_sources), len(unmatched_targets))
+			self.report({'WARNING'}, message)
 
 		return {'FINISHED'}
 
+	def rollback(self, context, backups):
+		"""
+		Restores the groups recorded by `steps`, removing the ones it created.
+		"""
+		from .weights import writeGroup
+
+		vertex_groups = context.active_object.vertex_groups
+		for name, created, backup in reversed(backups):
+			group = vertex_groups.get(name)
+			if group is None:
+				continue
+			if created:
+				vertex_groups.remove(group)
+			else:
+				for indices, (weights, mask) in backup:
+					writeGroup(group, indices, weights, mask)
+
+
+class VIEW3D_OT_mirror_weights(MirrorWeightsMixin, bpy.types.Operator):
+	bl_label = "Mirror weights"
+	bl_idname = "view3d.mirror_weights"
+	bl_description = "Mirror weights from one half to another"
+
+	def execute(self, context):
+		from .mirror import runSteps
+		return runSteps(self.steps(context))
+
+
+class VIEW3D_OT_mirror_weights_modal(MirrorWeightsMixin, bpy.types.Operator):
+	bl_label = "Mirror weights (interactive)"
+	bl_idname = "view3d.mirror_weights_modal"
+	bl_description = "Mirror weights from one half to another without freezing the interface. Shows the progress, Esc cancels and restores the weights."
+
+	def invoke(self, context, event):
+		self._backups = []
+		self._steps = self.steps(context, self._backups)
+		wm = context.window_manager
+		self._timer = wm.event_timer_add(MODAL_TIMER_INTERVAL, context.window)
+		wm.progress_begin(0, 100)
+		wm.modal_handler_add(self)
+		return {'RUNNING_MODAL'}
+
+	def modal(self, context, event):
+		if event.type == 'ESC':
+			self.cancel(context)
+			self.report({'INFO'}, "Mirroring cancelled, weights restored")
+			return {'CANCELLED'}
+
+		if event.type != 'TIMER':
+			return {'PASS_THROUGH'} if event.type in NAVIGATION_EVENTS else {'RUNNING_MODAL'}
+
+		deadline = time.perf_counter() + MODAL_TIME_BUDGET
+		try:
+			while time.perf_counter() < deadline:
+				stage, progress = next(self._steps)
+		except StopIteration as stop:
+			self.finish(context)
+			return stop.value
+		except Exception:
+			self.cancel(context)
+			raise
+
+		context.window_manager.progress_update(int(progress * 100))
+		if context.area:
+			context.area.header_text_set("Mirror weights: {0} {1}%, Esc to cancel".format(stage, int(progress * 100)))
+		return {'RUNNING_MODAL'}
+
+	def cancel(self, context):
+		self._steps.close()
+		self.rollback(context, self._backups)
+		self.finish(context)
+
+	def finish(self, context):
+		wm = context.window_manager
+		wm.event_timer_remove(self._timer)
+		wm.progress_end()
+		if context.area:
+			context.area.header_text_set()
+
 #works
 class VIEW3D_OT_select_half(bpy.types.Operator):
 	bl_label = "Select Half"
 	bl_idname = "view3d.select_half"
-	bl_description = "Selects the verticies that are to one side of pivot point."
+	bl_description = "Selects the verticies that are to one side of pivot point in every selected mesh."
 	bl_options = {'REGISTER', 'UNDO'}
 
 	axes_menu_items = (("x", "X", "", 0), ("y", "Y", "", 1), ("z", "Z", "", 2),)
@@ -297,21 +403,24 @@ class VIEW3D_OT_select_half(bpy.types.Operator):
 	deselect = bpy.props.BoolProperty(name="Deselect", subtype="NONE", description="If checked, deselects all previously selected vertices. If unchecked, appends selection.")
 
 	def execute(self, context):
-		active_obj = context.active_object
-		data = active_obj.data
 		axis_index = "xyz".index(self.axis)
+		threshold = 0.0 + self.margin * (-1 if self.negative else 1)
+
+		# the active object gets processed even if it is not selected
+		objects = getSelectedMeshObjects()
+		if context.active_object and context.active_object.type == 'MESH' and context.active_object not in objects:
+			objects.append(context.active_object)
 
-		bpy.ops.object.mode_set(mode="EDIT")
-		if self.deselect:
-			bpy.ops.mesh.select_all(action="DESELECT")
-		context.tool_settings.mesh_select_mode = (True, False, False)  # vert, edge, face
 		bpy.ops.object.mode_set(mode="OBJECT")  # or else it won't update
+		context.tool_settings.mesh_select_mode = (True, False, False)  # vert, edge, face
 
-		for vert in data.vertices:
-			sym_coord = vert.co[axis_index]
-			compare_me = sym_coord.__lt__ if self.negative else sym_coord.__gt__
-			if compare_me(0.0 + self.margin * (-1 if self.negative else 1)):
-				vert.select = True
+		meshes = []
+		for obj in objects:
+			if obj.data not in meshes:
+				meshes.append(obj.data)
+
+		for mesh in meshes:
+			selectVerticesBeyond(mesh, axis_index, threshold, self.negative, extend=not self.deselect)
 
 		bpy.ops.object.mode_set(mode="EDIT")
 
@@ -321,36 +430,68 @@ class VIEW3D_OT_select_half(bpy.types.Operator):
 class VIEW3D_OT_reinit_images(bpy.types.Operator):
 	bl_label = "Re-initialize images"
 	bl_idname = "view3d.reinit_images"
-	bl_description = "Regenerates images that correspond to selected image texture nodes in every material of the object. Useful when the images use external files and these files get deleted."
+	bl_description = "Regenerates images that correspond to selected image texture nodes in every material of selected objects. Useful when the images use external files and these files get deleted."
+
+	resize = bpy.props.BoolProperty(name="Resize", description="Regenerate the images at the given resolution instead of their current one")
+	width = bpy.props.IntProperty(name="Width", min=1, soft_max=16384, default=1024)
+	height = bpy.props.IntProperty(name="Height", min=1, soft_max=16384, default=1024)
 
 	def execute(self, context):
-		for slot in context.active_object.material_slots:
-			mat = slot.material
-			imag = mat.node_tree.nodes.active.image
+		from .images import getActiveImages
+
+		objects = list(context.selected_objects)
+		if context.active_object is not None and context.active_object not in objects:
+			objects.append(context.active_object)
+
+		# an image shared by several slots or objects is regenerated once
+		images = getActiveImages(objects)
+		for imag in images:
+			# the size goes first, so the buffer is allocated once, at the final resolution
+			if self.resize:
+				imag.generated_width = self.width
+				imag.generated_height = self.height
 			imag.source = 'GENERATED'
 
+		self.report({'INFO'}, "Re-initialized {0} images".format(len(images)))
+
 		return {'FINISHED'}
 
 #works
 class VIEW3D_OT_save_baked_images(bpy.types.Operator):
 	bl_label = "Save baked images"
 	bl_idname = "view3d.save_baked_images"
-	bl_description = "Saves all the baked images in active object."
+	bl_description = "Saves all the baked images in active object. Images that haven't changed since the last save are skipped."
 
 	directory = bpy.props.StringProperty(subtype="DIR_PATH")
 
 	def execute(self, context):
-		for slot in bpy.context.active_object.material_slots:
-			mat = slot.material
+		from .images import getActiveImages, fileTime, MANIFEST_NAME as IMAGES_MANIFEST
 
-			imag = mat.node_tree.nodes.active.image
+		manifest = loadManifest(self.directory, IMAGES_MANIFEST)
+		skipped = 0
 
-			# filepath_raw doesn't erase image data, unlike filepath
-			imag.filepath_raw = os.path.join(self.directory, imag.name + ".png")
+		# an image shared by several slots is saved once
+		images = getActiveImages([context.active_object])
+		for imag in images:
+			filename = imag.name + ".png"
+			filepath = os.path.join(self.directory, filename)
 
-			imag.file_format = 'PNG'
+			# unchanged: the image wasn't modified since it was saved to this file, and the file wasn't touched since
+			entry = manifest.get(filename)
+			if isinstance(entry, dict) and entry.get("mtime") is not None and entry["mtime"] == fileTime(filepath) \
+					and not imag.is_dirty and imag.filepath_raw == filepath:
+				skipped += 1
+				continue
 
+			# filepath_raw doesn't erase image data, unlike filepath
+			imag.filepath_raw = filepath
+			imag.file_format = 'PNG'
 			imag.save()
+			manifest[filename] = {"mtime": fileTime(filepath)}
+
+		saveManifest(self.directory, IMAGES_MANIFEST, manifest)
+
+		self.report({'INFO'}, "Saved {0} images, {1} unchanged".format(len(images) - skipped, skipped))
 
 		return {'FINISHED'}
 
@@ -363,24 +504,89 @@ class VIEW3D_OT_save_baked_images(bpy.types.Operator):
 class VIEW3D_OT_fake_backup_mesh(bpy.types.Operator):
 	bl_label = "Backup mesh"
 	bl_idname = "view3d.fake_backup_mesh"
-	bl_description = "Backups mesh, creating a fake user."
+	bl_description = "Backups mesh. The first backup is a copy with a fake user, the next ones store only the changed coordinates, unless the topology changes."
 
 	def execute(self, context):
+		from .snapshots import takeSnapshot
+
 		cur_mode = context.active_object.mode
 
 		bpy.ops.object.mode_set(mode="OBJECT")
 
-		orig_mesh = bpy.context.active_object.data
+		name = takeSnapshot(context.active_object.data, budget=context.scene.omnitools_backup_budget * 1024 * 1024)
 
-		NAME = orig_mesh.name
+		bpy.ops.object.mode_set(mode=cur_mode)
+
+		self.report({'INFO'}, "Backup " + name)
+
+		return {'FINISHED'}
+
+
+# Blender needs the items of dynamic enums to be referenced from python
+_backup_items = []
 
-		bak_mesh = orig_mesh.copy()
-		bak_mesh.name = NAME + "_old"
 
-		bak_mesh.use_fake_user = True
+def backupItems(self, context):
+	"""
+	Items of the backup list of active object's mesh, latest first.
+	"""
+	from .snapshots import getRegistry, listSnapshots
+
+	global _backup_items
+	_backup_items = []
+	obj = context.active_object
+	if obj is not None and obj.type == 'MESH':
+		registry = getRegistry(obj.data)
+		for name in reversed(listSnapshots(obj.data)):
+			entry = registry[name]
+			label = "{0} ({1}, {2:.1f} KB)".format(name, entry["kind"], entry["size"] / 1024.0)
+			_backup_items.append((name, label, ""))
+	return _backup_items
+
+
+class VIEW3D_OT_restore_mesh_backup(bpy.types.Operator):
+	bl_label = "Restore backup"
+	bl_idname = "view3d.restore_mesh_backup"
+	bl_description = "Restores active object's mesh from a backup made with 'Backup mesh'."
+
+	backup = bpy.props.EnumProperty(items=backupItems, name="Backup")
+
+	def execute(self, context):
+		from .snapshots import restoreSnapshot
+
+		if not self.backup:
+			self.report({'ERROR'}, "The mesh has no backups")
+			return {'CANCELLED'}
+
+		cur_mode = context.active_object.mode
+
+		bpy.ops.object.mode_set(mode="OBJECT")
+
+		restored = restoreSnapshot(context.active_object, self.backup)
 
 		bpy.ops.object.mode_set(mode=cur_mode)
 
+		if not restored:
+			self.report({'ERROR'}, "The backup's base mesh copy is missing, it was renamed or removed")
+			return {'CANCELLED'}
+
+		return {'FINISHED'}
+
+
+class VIEW3D_OT_prune_mesh_backups(bpy.types.Operator):
+	bl_label = "Prune backups"
+	bl_idname = "view3d.prune_mesh_backups"
+	bl_description = "Removes the oldest backups of active object's mesh."
+
+	keep = bpy.props.IntProperty(name="Keep", description="Amount of latest backups to keep", min=0, default=5)
+
+	def execute(self, context):
+		from .snapshots import pruneSnapshots
+
+		removed = pruneSnapshots(context.active_object.data, budget=context.scene.omnitools_backup_budget * 1024 * 1024, keep=self.keep)
+
+		self.report({'INFO'}, "Removed {0} backups".format(removed))
+
 		return {'FINISHED'}
 
 #works
@@ -390,15 +596,27 @@ class VIEW3D_OT_make_single_user(bpy.types.Operator):
 	bl_description = "Creates a new mesh with the same name and assigns the object to it, effectively making it single-user. The old mesh is backed up with '_multi' postfix. Useful when you need to apply modifiers to multi-user data."
 
 	def execute(self, context):
+		from .snapshots import REGISTRY_KEY
+
 		bpy.ops.object.mode_set(mode="OBJECT")
 		active_obj = bpy.context.scene.objects.active
 		orig_mesh = active_obj.data
+
+		# a fake user doesn't make the mesh shared
+		if orig_mesh.users - orig_mesh.use_fake_user <= 1:
+			self.report({'INFO'}, "The mesh is already single-user")
+			return {'FINISHED'}
+
 		NAME = orig_mesh.name
 		copy_mesh = orig_mesh.copy()
 		orig_mesh.name = NAME + "_multi"
 		active_obj.data = copy_mesh
 		copy_mesh.name = NAME
 
+		# backups go with the object, two meshes must not share the copies they are based on
+		if REGISTRY_KEY in orig_mesh:
+			del orig_mesh[REGISTRY_KEY]
+
 		return {'FINISHED'}
 
 
@@ -406,17 +624,56 @@ class VIEW3D_OT_make_single_user(bpy.types.Operator):
 class VIEW3D_OT_dae_export_selected_per_scene(bpy.types.Operator):
 	bl_label = "Collada export selected per scene"
 	bl_idname = "view3d.dae_export_selected_per_scene"
-	bl_description = "Iterates over all scenes and exports meshes from each into a separate .dae file."
+	bl_description = "Iterates over all scenes and exports meshes from each into a separate .dae file. " \
+					 "Scenes are exported in parallel background processes, unchanged scenes are skipped."
 
 	directory = bpy.props.StringProperty(subtype="DIR_PATH")
+	skip_unchanged = bpy.props.BoolProperty(name="Skip unchanged scenes", default=True,
+											description="Don't export scenes whose selected objects haven't changed since the last export. "
+														"Changes of image files are not detected.")
 
 	def execute(self, context):
+		blend_path = bpy.data.filepath
+		if not blend_path:
+			self.report({'ERROR'}, 'Save the file first!')
+			return {'CANCELLED'}
+
+		# workers read the file from disk, so they get a copy with the current state
+		source = blend_path
+		if bpy.data.is_dirty:
+			source = os.path.join(tempfile.gettempdir(), "omnitools_export_" + bpy.path.basename(blend_path))
+			bpy.ops.wm.save_as_mainfile(filepath=source, copy=True)
+
+		from .exporter import sceneHash, exportCommand, runJobs, MANIFEST_NAME as DAE_MANIFEST
+
+		manifest = loadManifest(self.directory, DAE_MANIFEST)
+		jobs = []
 		for scene in bpy.data.scenes:
-			context.screen.scene = scene
-			filepath = os.path.join(self.directory,
-					   os.path.splitext(bpy.path.basename(bpy.context.blend_data.filepath))[
-						   0] + "_" + scene.name + ".dae")
-			bpy.ops.wm.collada_export(filepath=filepath, apply_modifiers=True, selected=True)
+			filename = os.path.splitext(bpy.path.basename(blend_path))[0] + "_" + scene.name + ".dae"
+			filepath = os.path.join(self.directory, filename)
+			digest = sceneHash(scene)
+			if self.skip_unchanged and manifest.get(filename) == digest and os.path.exists(filepath):
+				continue
+			jobs.append((filename, digest, exportCommand(bpy.app.binary_path, source, scene.name, filepath)))
+
+		return_codes = runJobs([command for filename, digest, command in jobs])
+
+		failed = []
+		for (filename, digest, command), return_code in zip(jobs, return_codes):
+			if return_code == 0:
+				manifest[filename] = digest
+			else:
+				failed.append(filename)
+		saveManifest(self.directory, DAE_MANIFEST, manifest)
+
+		if source != blend_path:
+			os.remove(source)
+
+		skipped = len(bpy.data.scenes) - len(jobs)
+		if failed:
+			self.report({'ERROR'}, "Failed to export: " + ", ".join(failed))
+		else:
+			self.report({'INFO'}, "Exported {0} scenes, {1} unchanged".format(len(jobs), skipped))
 
 		return {'FINISHED'}
 
@@ -434,7 +691,7 @@ class VIEW3D_OT_array_rotation_jitter(bpy.types.Operator):
 
 	# changeable parameters
 
-	total = bpy.props.IntProperty(name="Amount of instances", default=2, min=1, max=1000)
+	total = bpy.props.IntProperty(name="Amount of instances", default=2, min=1, max=100000, soft_max=10000)
 	offsets = bpy.props.FloatVectorProperty(name="Fixed Offsets", unit="LENGTH", subtype="TRANSLATION")
 	max_rotations = bpy.props.FloatVectorProperty(name="Maximum rotations", unit="ROTATION"
 												  , subtype="EULER", min=0)
@@ -442,30 +699,60 @@ class VIEW3D_OT_array_rotation_jitter(bpy.types.Operator):
 													   unit="LENGTH", subtype="TRANSLATION", min=0)
 	scale_jitter = bpy.props.FloatVectorProperty(name="Scale Jitter", unit="LENGTH"
 												 , subtype="DIRECTION", min=0)
+	seed = bpy.props.IntProperty(name="Seed", min=0, description="Random seed. The same seed gives the same array.")
+	output = bpy.props.EnumProperty(name="Output", default="OBJECTS",
+									items=(("OBJECTS", "Objects", "A linked copy of the object per instance"),
+										   ("MERGED", "Merged mesh", "One object with all the instances in its mesh"),
+										   ("INSTANCES", "Dupli-faces",
+											"One object with a face per instance that instances a linked duplicate of the object. "
+											"Instances get uniform scale")))
 
 	def execute(self, context):
 		scene = context.scene
-		cursor = scene.cursor_location
 		obj = scene.objects.active
 
-		for i in range(self.total):
-			obj_new = obj.copy()  # copy current object
-			scene.objects.link(obj_new)  # add object to scene
-
-			# offset
-			cur_position_jitter = [random.random() for i in range(3)]
-			obj_new.location = [a + b * (i + 1) + (2 * d - 1) * c for a, b, c, d in
-								zip(obj.location, self.offsets, self.max_random_offsets, cur_position_jitter)]
-
-			# scale randomness
-			cur_scale_jitter = [random.random() for i in range(3)]
-			obj_new.scale = [a + b * (2 * c - 1) for a, b, c in
-							 zip(obj.scale, self.scale_jitter, cur_scale_jitter)]
-
-			# apply rotation randomness
-			cur_rotation_jitter = [random.random() for i in range(3)]
-			obj_new.rotation_euler = [a + b * (2 * c - 1) for a, b, c in
-									  zip(obj.rotation_euler, self.max_rotations, cur_rotation_jitter)]
+		# all the jitter is generated at once
+		locations, rotations, scales = jitterTransforms(self.total, obj.location, obj.rotation_euler, obj.scale,
+														self.offsets, self.max_random_offsets, self.max_rotations,
+														self.scale_jitter, self.seed)
+
+		if self.output == "MERGED":
+			if obj.type != 'MESH':
+				self.report({'ERROR'}, "Only meshes can be merged")
+				return {'CANCELLED'}
+			from . import instancing
+			mesh = instancing.buildMergedMesh(obj.data, obj.name + "_array", locations, rotations, scales,
+											  instancing.eulerMode(obj))
+			# the instances are in world space already
+			scene.objects.link(bpy.data.objects.new(obj.name + "_array", mesh))
+			return {'FINISHED'}
+
+		if self.output == "INSTANCES":
+			from . import instancing
+			mesh = instancing.buildInstanceMesh(obj, obj.name + "_instances", locations, rotations, scales)
+			emitter = bpy.data.objects.new(obj.name + "_instances", mesh)
+			emitter.dupli_type = 'FACES'
+			emitter.use_dupli_faces_scale = True
+			emitter.dupli_faces_scale = 1.0
+			scene.objects.link(emitter)
+			# a linked duplicate is instanced, so the object keeps its parent and running again makes a new pair.
+			# The emitter is at the origin, so the duplicate stays where the object is.
+			instance = obj.copy()
+			scene.objects.link(instance)
+			instance.parent = emitter
+			instance.matrix_world = obj.matrix_world.copy()
+			# the object keeps its own scale inside the instances, only the jitter is averaged
+			if any(self.scale_jitter):
+				self.report({'WARNING'}, "Dupli-faces scale uniformly, instances got the mean of their scale jitter")
+			return {'FINISHED'}
+
+		link = scene.objects.link
+		for location, rotation, scale in zip(locations, rotations, scales):
+			obj_new = obj.copy()  # copy current object. Mesh data stays linked.
+			obj_new.location = location
+			obj_new.rotation_euler = rotation
+			obj_new.scale = scale
+			link(obj_new)  # add object to scene
 
 		return {'FINISHED'}
 
@@ -473,22 +760,98 @@ class VIEW3D_OT_array_rotation_jitter(bpy.types.Operator):
 class VIEW3D_OT_move_pivot(bpy.types.Operator):
 	bl_idname = "view3d.move_pivot"  # unique identifier for buttons and menu items to reference.
 	bl_label = "Move Pivot"  # display name in the interface.
-	bl_description = "Moves the pivot point (origin) according to input. Values are relative to object sizes, not world."
+	bl_description = "Moves the pivot point (origin) according to input. Values are relative to object sizes, not world. Objects sharing the mesh are moved too."
 	bl_options = {'REGISTER', 'UNDO'}  # enable undo for the operator.
 
 	pivot_offset = bpy.props.FloatVectorProperty(name="Pivot Offset",
 												 unit="LENGTH", subtype="TRANSLATION")
+	batch = bpy.props.BoolProperty(name="All selected", subtype="NONE",
+								   description="Move the pivots of all selected meshes, not just the active one.")
 
 	def execute(self, context):  # execute() is called by blender when running the operator.
 		scene = context.scene
 		obj = scene.objects.active
-		mesh = bpy.context.active_object.data
+
+		from mathutils import Vector
+		from . import kernels
 
 		bpy.ops.object.mode_set(mode="OBJECT")  # it doesn't work in EDIT mode!
 
-		for vertex in mesh.vertices:
-			vertex.co -= self.pivot_offset
+		objects = getSelectedMeshObjects() if self.batch else [obj]
+
+		# a mesh shared by several objects is shifted once, and all of its users are moved
+		users = dict()
+		for user in bpy.data.objects:
+			if user.type == 'MESH':
+				users.setdefault(user.data.as_pointer(), []).append(user)
 
-		obj.location += vectorMultiply(self.pivot_offset, obj.scale)
+		done = set()
+		for obj in objects:
+			mesh = obj.data
+			if mesh.as_pointer() in done:
+				continue
+			done.add(mesh.as_pointer())
+
+			offsetVertices(mesh, self.pivot_offset)
+
+			# the shift of the vertices in world space is the offset scaled by the object's scale
+			owners = users[mesh.as_pointer()]
+			shifts = kernels.toList(kernels.scaled(kernels.fromList([user.scale for user in owners]), self.pivot_offset))
+			for user, shift in zip(owners, shifts):
+				user.location += Vector(shift)
 
 		return {'FINISHED'}  # this lets blender know the operator finished successfully.
+
+
+class VIEW3D_OT_dump_profile(bpy.types.Operator):
+	bl_idname = "view3d.dump_profile"
+	bl_label = "Dump profile"
+	bl_description = "Saves the timings of recent operator runs to a JSON file."
+	omnitools_profile = False
+
+	filepath = bpy.props.StringProperty(subtype="FILE_PATH")
+
+	def execute(self, context):
+		dumpHistory(bpy.path.ensure_ext(self.filepath, ".json"))
+		return {'FINISHED'}
+
+	def invoke(self, context, event):
+		wm = context.window_manager
+		wm.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+
+
+class VIEW3D_OT_clear_profile(bpy.types.Operator):
+	bl_idname = "view3d.clear_profile"
+	bl_label = "Clear profile"
+	bl_description = "Clears the timings of recent operator runs."
+	omnitools_profile = False
+
+	def execute(self, context):
+		history.clear()
+		return {'FINISHED'}
+
+
+# record timings of every operator run
+profileOperators(globals())
+
+classes = (
+	VIEW3D_OT_unwrap,
+	VIEW3D_OT_next_material_select,
+	VIEW3D_OT_previous_material_select,
+	VIEW3D_OT_this_material_select,
+	VIEW3D_OT_mirror_weights,
+	VIEW3D_OT_mirror_weights_modal,
+	VIEW3D_OT_select_half,
+	VIEW3D_OT_reinit_images,
+	VIEW3D_OT_save_baked_images,
+	VIEW3D_OT_fake_backup_mesh,
+	VIEW3D_OT_restore_mesh_backup,
+	VIEW3D_OT_prune_mesh_backups,
+	VIEW3D_OT_make_single_user,
+	VIEW3D_OT_dae_export_selected_per_scene,
+	VIEW3D_OT_array_rotation_jitter,
+	VIEW3D_OT_move_pivot,
+	VIEW3D_OT_dump_profile,
+	VIEW3D_OT_clear_profile,
+)
@@ -15,32 +15,55 @@ bl_info = {
 }
 
 # To support reload properly, try to access a package var,
-# if it's there, reload everything
+# if it's there, reload everything. Modules imported lazily by the operators are reloaded too.
 if "bpy" in locals():
+	import sys
 	try:
-		import importlib
-		importlib.reload(OmniTools)
+		from importlib import reload
 	except ImportError:
-		import imp
-		imp.reload(OmniTools)
-	print("Reloaded multifiles")
+		from imp import reload
+	for name, module in sorted(sys.modules.items()):
+		if name.startswith(__name__ + ".") and module is not None and name != OmniTools.__name__:
+			reload(module)
+	reload(OmniTools)
 else:
+	from . import utils
+	from . import live
 	from . import OmniTools
-	print("Imported multifiles")
 
+import sys
 import bpy
 from bpy.props import *
 
 PROCESSES = 4
-bpy.types.Scene.omnitools_processes = IntProperty(name="Processes", description="", min=PROCESSES, )
 
-algorithms_menu_items = (("vector_grouper", "Vector-grouper", "", 1), ("perebor", "Perebor", "", 0))
+algorithms_menu_items = (("vector_grouper", "Vector-grouper", "", 1), ("perebor", "Perebor", "", 0), ("spatial_hash", "Spatial hash", "", 2),
+						 ("quantized", "Quantized (NumPy)", "", 3), ("chunked", "Chunked", "Spatial hash in chunks along the axis, with bounded memory", 4),
+						 ("topology", "Topology", "Walks the edges from the vertices on the plane of symmetry. Works on imprecisely symmetrical meshes", 5))
 axes_menu_items = (("x", "X", "", 0), ("y", "Y", "", 1), ("z", "Z", "", 2),)
-bpy.types.Scene.weight_mirror_algorithm = bpy.props.EnumProperty(items=algorithms_menu_items, name="Algorithm", description="")
-bpy.types.Scene.weight_mirror_resolution = bpy.props.FloatProperty(name="Resolution",description="", min=1, default=14, max=30)
-bpy.types.Scene.weight_mirror_axis = bpy.props.EnumProperty(items=axes_menu_items, name="Axis", description="Axis of symmetry")
-bpy.types.Scene.weight_mirror_negative = bpy.props.BoolProperty(name="Negative", subtype="NONE",
-								  description="Select vertices on negative side of symmetry axis. If unchecked - on positive.")
+
+
+def getSceneProperties():
+	"""
+	Returns {name: property} of the properties this add-on adds to scenes.
+	"""
+	return {
+		"omnitools_processes": IntProperty(name="Processes", description="Amount of threads and background processes used by the heavy tools", min=1, soft_max=64, default=PROCESSES),
+		"weight_mirror_algorithm": bpy.props.EnumProperty(items=algorithms_menu_items, name="Algorithm", description=""),
+		"weight_mirror_resolution": bpy.props.FloatProperty(name="Resolution",description="", min=1, default=14, max=30),
+		"weight_mirror_axis": bpy.props.EnumProperty(items=axes_menu_items, name="Axis", description="Axis of symmetry"),
+		"weight_mirror_negative": bpy.props.BoolProperty(name="Negative", subtype="NONE",
+								  description="Select vertices on negative side of symmetry axis. If unchecked - on positive."),
+		"weight_mirror_memory_limit": IntProperty(name="Memory limit (MB)", description="Memory the chunked search may use per chunk", min=16, default=512),
+		"weight_mirror_live": bpy.props.BoolProperty(name="Live mirror",
+								  description="While weight painting, mirror the changes of the active group whenever painting pauses. The counterpart group (e.g. .L/.R) gets them if there is one, otherwise the group itself. Every check reads the whole painted side, so on dense meshes the mirrored side lags behind"),
+		"omnitools_show_profile": bpy.props.BoolProperty(name="Profiling", description="Show timings of recent operator runs"),
+		"weight_mirror_all_groups": bpy.props.BoolProperty(name="All groups",
+								  description="Mirror all vertex groups at once. Groups with a side in the name (.L/.R, _l/_r, Left/Right) are mirrored onto their counterparts."),
+		"weight_mirror_group_filter": bpy.props.StringProperty(name="Filter",
+								  description="Only the groups matching this wildcard pattern (e.g. 'DEF-*') are mirrored. Empty means all groups."),
+		"omnitools_backup_budget": IntProperty(name="Backup budget (MB)", description="Memory the backups of one mesh may take. The oldest backups are removed when it is exceeded", min=1, default=256),
+	}
 
 
 # main class of this toolbar
@@ -54,8 +77,8 @@ class VIEW3D_PT_OmniTools(bpy.types.Panel):
 		layout = self.layout
 		view = context.space_data
 
-		# col = layout.column(align=True)
-		# layout.prop(data=context.scene, property='processes')
+		col = layout.column(align=True)
+		col.prop(data=context.scene, property='omnitools_processes')
 
 		col = layout.column(align=True)
 		col.operator("view3d.unwrap_per_material",text="Unwrap per material")
@@ -76,6 +99,9 @@ class VIEW3D_PT_OmniTools(bpy.types.Panel):
 
 		col = layout.column(align=True)
 		col.operator("view3d.fake_backup_mesh",text="Backup mesh")
+		col.operator_menu_enum("view3d.restore_mesh_backup", "backup", text="Restore backup")
+		col.operator("view3d.prune_mesh_backups",text="Prune backups")
+		col.prop(data=context.scene, property='omnitools_backup_budget')
 
 		col = layout.column(align=True)
 		col.operator("view3d.make_single_user",text="Make mesh single-user")
@@ -93,21 +119,65 @@ class VIEW3D_PT_OmniTools(bpy.types.Panel):
 
 		col = layout.column(align=True)
 		col.operator("view3d.mirror_weights",text="Mirror Weights")
+		col.operator("view3d.mirror_weights_modal",text="Mirror Weights (interactive)")
 		col.prop(data=context.scene, property='weight_mirror_algorithm')
 		col.prop(data=context.scene, property='weight_mirror_axis')
 		col.prop(data=context.scene, property='weight_mirror_negative')
 		col.prop(data=context.scene, property='weight_mirror_resolution')
+		row = col.row(align=True)
+		row.active = context.scene.weight_mirror_algorithm == "chunked"
+		row.prop(data=context.scene, property='weight_mirror_memory_limit')
+		col.prop(data=context.scene, property='weight_mirror_all_groups')
+		row = col.row(align=True)
+		row.active = context.scene.weight_mirror_all_groups
+		row.prop(data=context.scene, property='weight_mirror_group_filter')
+		col.prop(data=context.scene, property='weight_mirror_live')
+
+		box = layout.box()
+		row = box.row()
+		show_profile = context.scene.omnitools_show_profile
+		row.prop(data=context.scene, property='omnitools_show_profile', icon="TRIA_DOWN" if show_profile else "TRIA_RIGHT",
+				 icon_only=True, emboss=False)
+		row.label(text="Profiling")
+		if show_profile:
+			col = box.column(align=True)
+			# latest first
+			for record in list(OmniTools.history)[:-11:-1]:
+				col.label(text=OmniTools.formatRecord(record), translate=False)
+			row = box.row(align=True)
+			row.operator("view3d.dump_profile", text="Dump to JSON")
+			row.operator("view3d.clear_profile", text="Clear")
 
 
 ################
 ### REGISTRATION
 ################
 
+classes = OmniTools.classes + (VIEW3D_PT_OmniTools,)
+
 def register():
-	bpy.utils.register_module(__name__)
+	for cls in classes:
+		bpy.utils.register_class(cls)
+	for name, prop in getSceneProperties().items():
+		setattr(bpy.types.Scene, name, prop)
+	bpy.app.handlers.scene_update_post.append(utils.invalidateMaterialFaceIndex)
+	bpy.app.handlers.load_post.append(utils.clearMaterialFaceIndex)
+	bpy.app.handlers.scene_update_post.append(live.liveMirror)
+	bpy.app.handlers.load_post.append(live.clearLiveMirror)
 
 def unregister():
-	bpy.utils.unregister_module(__name__)
+	bpy.app.handlers.scene_update_post.remove(utils.invalidateMaterialFaceIndex)
+	bpy.app.handlers.load_post.remove(utils.clearMaterialFaceIndex)
+	bpy.app.handlers.scene_update_post.remove(live.liveMirror)
+	bpy.app.handlers.load_post.remove(live.clearLiveMirror)
+	for name in getSceneProperties():
+		delattr(bpy.types.Scene, name)
+	for cls in reversed(classes):
+		bpy.utils.unregister_class(cls)
+	# only if it was ever used
+	pool = sys.modules.get(__name__ + ".pool")
+	if pool:
+		pool.shutdown()
 
 if __name__ == "__main__":
-	register()
\ No newline at end of file
+	register()
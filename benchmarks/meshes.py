@@ -0,0 +1,47 @@
+"""
+Generators of synthetic symmetric meshes for the benchmarks.
+"""
+
+import numpy as np
+
+
+def symmetricGrid(vertex_count, axis_index=0, noise=0.0, seam_offset=0.0, seed=0):
+	"""
+	Generates a grid mesh symmetrical along the axis, with a seam column of vertices on the plane of symmetry.
+	Vertex order is shuffled, like in a mesh that went through some modelling.
+	:param vertex_count: approximate amount of vertices
+	:param noise: random displacement added to every coordinate of the target half, to mimic imprecise symmetry
+	:param seam_offset: maximum random distance of the seam vertices from the plane of symmetry
+	:return: tuple (coords (N, 3) float32, edges (E, 2) int32, faces (F, 4) int32)
+	"""
+	rand = np.random.RandomState(seed)
+	rows = max(int(np.sqrt(vertex_count)), 2)
+	half = max(rows // 2, 1)
+	columns = 2 * half + 1
+
+	# columns go from -half to half along the axis, column `half` is the seam
+	u, v = np.meshgrid(np.arange(columns) - half, np.arange(rows), indexing="xy")
+	coords = np.zeros((rows * columns, 3), dtype=np.float64)
+	other_axes = [i for i in range(3) if i != axis_index]
+	coords[:, axis_index] = u.ravel() / float(half)
+	coords[:, other_axes[0]] = v.ravel() / float(rows)
+	# bumps, so the vertices don't all lie on one plane
+	coords[:, other_axes[1]] = 0.1 * np.sin(coords[:, axis_index] * 7) ** 2 * np.cos(coords[:, other_axes[0]] * 5)
+
+	negative_half = coords[:, axis_index] < 0
+	coords[negative_half] += rand.uniform(-noise, noise, (negative_half.sum(), 3))
+	seam = u.ravel() == 0
+	coords[seam, axis_index] += rand.uniform(-seam_offset, seam_offset, seam.sum())
+
+	grid = np.arange(rows * columns).reshape(rows, columns)
+	horizontal = np.column_stack((grid[:, :-1].ravel(), grid[:, 1:].ravel()))
+	vertical = np.column_stack((grid[:-1].ravel(), grid[1:].ravel()))
+	edges = np.concatenate((horizontal, vertical))
+	faces = np.column_stack((grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel(), grid[1:, 1:].ravel(), grid[1:, :-1].ravel()))
+
+	order = rand.permutation(len(coords))
+	new_index = np.empty_like(order)
+	new_index[order] = np.arange(len(order))
+
+	return coords[order].astype(np.float32), new_index[edges].astype(np.int32), new_index[faces].astype(np.int32)
+
@@ -0,0 +1,264 @@
+"""
+Headless benchmarks of the add-on's heavy code paths. Runs outside of Blender on stand-ins from `standin.py`.
+
+	python benchmarks/run.py                      # compare with benchmarks/baseline.json
+	python benchmarks/run.py --sizes 1000 5000000 # custom mesh sizes
+	python benchmarks/run.py --update-baseline    # store the current results as the baseline
+
+Exits with status 1 if a case got slower than `tolerance` times its baseline, found fewer pairs,
+or the chunked search paired differently from the spatial hash.
+Timings are compared relative to a reference workload timed in the same run, so the baseline holds
+on machines of other speed or load. Pair counts are compared as they are.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standin
+import meshes
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+MARGIN = 0.00001
+
+# differences below that are timer noise, not regressions
+NOISE_SECONDS = 0.02
+
+# name of the reference workload in the results and the baseline
+REFERENCE = "reference"
+
+# O(n^2) cases are not run above these sizes
+MAX_SIZES = {"perebor": 10000}
+
+
+def timeIt(func, repeat=3):
+	"""
+	:return: tuple (best time of `repeat` runs, result of the last run)
+	"""
+	best = float("inf")
+	result = None
+	for i in range(repeat):
+		start = time.perf_counter()
+		result = func()
+		best = min(best, time.perf_counter() - start)
+	return best, result
+
+
+def referenceWork():
+	"""
+	Fixed work of the kinds the cases consist of: python loops over lists and dicts, and numpy calls.
+	"""
+	rows = [[i * 0.5, i * 0.25, i * 0.125] for i in range(100000)]
+	grid = dict()
+	for i, (x, y, z) in enumerate(rows):
+		grid.setdefault(int(x * x + y * y + z * z) // 7, []).append(i)
+	numpy.sort(numpy.random.RandomState(0).random_sample(1000000))
+	return len(grid)
+
+
+def makeObject(size, noise=MARGIN / 4, seam_offset=MARGIN / 4):
+	coords, edges, faces = meshes.symmetricGrid(size, noise=noise, seam_offset=seam_offset)
+	return standin.Object(standin.Mesh(coords, edges, faces))
+
+
+def benchmarkMirror(addon, size):
+	"""
+	Times every matching algorithm on the same mesh.
+	"""
+	from omnitools import mirror
+	obj = makeObject(size)
+	coords = addon.utils.getVertexCoordinates(obj.data)
+	coords_list = coords.tolist()
+	edges = obj.data.edges.attributes["vertices"]
+	cases = (
+		("perebor", lambda: mirror.pereborPairs(coords_list, 0, MARGIN)),
+		("vector_grouper", lambda: mirror.vectorGrouperPairs(coords_list, 0, MARGIN)),
+		("spatial_hash", lambda: mirror.spatialHashPairs(coords_list, 0, MARGIN)),
+		("quantized", lambda: mirror.quantizedPairs(coords, 0, MARGIN)),
+		# about four chunks, so the cuts are exercised
+		("chunked", lambda: mirror.chunkedPairs(coords, 0, MARGIN, memory_limit=size // 4 * mirror.VERTEX_BYTES)),
+		("topology", lambda: mirror.topologyPairs(coords_list, edges, 0, MARGIN)),
+	)
+	results = dict()
+	pairs = dict()
+	for name, func in cases:
+		if size > MAX_SIZES.get(name, float("inf")):
+			continue
+		seconds, (sources, targets, unmatched_sources, unmatched_targets) = timeIt(func, repeat=2 if size > 10000 else 3)
+		results[name] = {"seconds": seconds, "pairs": len(sources)}
+		pairs[name] = (sources, targets, unmatched_sources, unmatched_targets)
+	# the chunked search must pair exactly like the one it splits
+	results["chunked"]["same_pairs"] = samePairs(pairs["chunked"], pairs["spatial_hash"])
+
+	# far from the origin float32 can't tell the margin apart, and with no margin nothing pairs.
+	# Every vertex must still be paired or reported, like the spatial hash does.
+	for name, scale, margin in (("chunked_far", 1000.0, MARGIN), ("chunked_zero_margin", 1.0, 0.0)):
+		far_coords = meshes.symmetricGrid(size)[0] * scale
+		expected = mirror.spatialHashPairs(far_coords.tolist(), 0, margin)
+		seconds, result = timeIt(lambda: mirror.chunkedPairs(far_coords, 0, margin, memory_limit=size // 4 * mirror.VERTEX_BYTES), repeat=1)
+		results[name] = {"seconds": seconds, "pairs": len(result[0]), "same_pairs": samePairs(result, expected)}
+	return results
+
+
+def samePairs(result, expected):
+	"""
+	Checks whether two results of the `*Pairs` functions have the same pairs and the same unmatched vertices.
+	"""
+	sources, targets, unmatched_sources, unmatched_targets = result
+	expected_sources, expected_targets, expected_unmatched_sources, expected_unmatched_targets = expected
+	return set(zip(sources, targets)) == set(zip(expected_sources, expected_targets)) and \
+		   sorted(unmatched_sources) == sorted(expected_unmatched_sources) and \
+		   sorted(unmatched_targets) == sorted(expected_unmatched_targets)
+
+
+def benchmarkOperators(addon, size):
+	"""
+	Times the operators working on whole meshes.
+	"""
+	results = dict()
+	obj = makeObject(size)
+	context = standin.makeContext([obj])
+
+	operator = addon.OmniTools.VIEW3D_OT_select_half()
+	operator.margin = MARGIN
+	seconds, result = timeIt(lambda: operator.execute(context))
+	results["select_half"] = {"seconds": seconds}
+
+	operator = addon.OmniTools.VIEW3D_OT_move_pivot()
+	operator.pivot_offset = (0.1, 0.2, 0.3)
+	seconds, result = timeIt(lambda: operator.execute(context))
+	results["move_pivot"] = {"seconds": seconds}
+
+	obj = makeObject(size)
+	group = obj.vertex_groups.new(name="Group")
+	group.add(range(0, size, 2), 0.5, "REPLACE")
+	context = standin.makeContext([obj])
+	operator = addon.OmniTools.VIEW3D_OT_mirror_weights()
+	operator.margin = MARGIN
+	from omnitools.mirror import pair_cache
+
+	def mirrorWeights():
+		# every run searches, none is served from the cache
+		pair_cache.clear()
+		return operator.execute(context)
+
+	seconds, result = timeIt(mirrorWeights, repeat=2)
+	results["mirror_weights"] = {"seconds": seconds}
+
+	from omnitools import weights
+	seconds, (group_weights, mask) = timeIt(lambda: weights.readGroup(group))
+	results["weights.readGroup"] = {"seconds": seconds}
+	seconds, result = timeIt(lambda: weights.writeGroup(group, range(len(mask)), group_weights, mask))
+	results["weights.writeGroup"] = {"seconds": seconds}
+
+	return results
+
+
+def benchmarkVectorHelpers(addon, size):
+	"""
+	Times the scalar helpers of `utils` called once per vertex, the way operators used to call them,
+	and their batched equivalents in `kernels`.
+	"""
+	utils = addon.utils
+	coords = makeObject(size).data.vertices.attributes["co"].tolist()
+	pivot = (0.5, 0.5, 0.0)
+	factors = (1.0, 2.0, 3.0)
+	from omnitools import kernels
+	vectors = kernels.fromList(coords)
+	return {
+		"kernels.squaredDistances": {"seconds": timeIt(lambda: kernels.squaredDistances(vectors, pivot))[0]},
+		"kernels.scaled": {"seconds": timeIt(lambda: kernels.scaled(vectors, factors))[0]},
+		"kernels.mirrored": {"seconds": timeIt(lambda: kernels.mirrored(vectors, 0))[0]},
+		"vectorLength": {"seconds": timeIt(lambda: [utils.vectorLength(co, pivot, True) for co in coords])[0]},
+		"radiusVectorLength": {"seconds": timeIt(lambda: [utils.radiusVectorLength(co) for co in coords])[0]},
+		"vectorMultiply": {"seconds": timeIt(lambda: [utils.vectorMultiply(co, factors) for co in coords])[0]},
+	}
+
+
+def runAll(sizes):
+	"""
+	:return: {case name: {size as string: {"seconds": float, ["pairs": int]}}}
+	"""
+	addon = standin.loadAddon()
+	results = {REFERENCE: {"all": {"seconds": timeIt(referenceWork, repeat=5)[0]}}}
+	print("{0:>20} {1:>9} {2:10.4f}s".format(REFERENCE, "", results[REFERENCE]["all"]["seconds"]))
+	for size in sizes:
+		for benchmark in (benchmarkMirror, benchmarkOperators, benchmarkVectorHelpers):
+			for name, result in benchmark(addon, size).items():
+				results.setdefault(name, dict())[str(size)] = result
+				print("{0:>20} {1:>9} {2:10.4f}s {3} {4}".format(name, size, result["seconds"], result.get("pairs", ""),
+																 "" if result.get("same_pairs", True) else "DIFFERENT PAIRS"))
+	return results
+
+
+def compare(results, baseline, tolerance):
+	"""
+	Baseline timings are scaled by the ratio of the reference workload timings first.
+	:return: list of messages about regressions
+	"""
+	speed = 1.0
+	if REFERENCE in baseline:
+		speed = results[REFERENCE]["all"]["seconds"] / baseline[REFERENCE]["all"]["seconds"]
+
+	regressions = []
+	for name, by_size in results.items():
+		if name == REFERENCE:
+			continue
+		for size, result in by_size.items():
+			if result.get("same_pairs") is False:
+				regressions.append("{0} at {1}: pairs differ from spatial_hash".format(name, size))
+			old = baseline.get(name, dict()).get(size)
+			if old is None:
+				continue
+			expected = old["seconds"] * speed
+			if result["seconds"] > expected * tolerance and result["seconds"] - expected > NOISE_SECONDS:
+				regressions.append("{0} at {1}: {2:.4f}s, baseline {3:.4f}s on this machine".format(name, size, result["seconds"], expected))
+			if result.get("pairs", 0) < old.get("pairs", 0):
+				regressions.append("{0} at {1}: {2} pairs, baseline {3}".format(name, size, result["pairs"], old["pairs"]))
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="vertex counts of the meshes")
+	parser.add_argument("--baseline", default=BASELINE_PATH)
+	parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown relative to the baseline")
+	parser.add_argument("--update-baseline", action="store_true")
+	args = parser.parse_args()
+
+	results = runAll(args.sizes)
+
+	if args.update_baseline:
+		baseline = dict()
+		if os.path.exists(args.baseline):
+			with open(args.baseline) as f:
+				baseline = json.load(f)
+		for name, by_size in results.items():
+			baseline.setdefault(name, dict()).update(by_size)
+		with open(args.baseline, "w") as f:
+			json.dump(baseline, f, indent=1, sort_keys=True)
+		print("Baseline updated:", args.baseline)
+		return 0
+
+	if not os.path.exists(args.baseline):
+		print("No baseline to compare with. Run with --update-baseline first.")
+		return 0
+
+	with open(args.baseline) as f:
+		regressions = compare(results, json.load(f), args.tolerance)
+	for message in regressions:
+		print("REGRESSION:", message)
+	return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Lightweight stand-ins for the parts of `bpy`, `bmesh` and `mathutils` the add-on uses,
+so its modules can be imported and timed outside of Blender.
+`install()` puts them into `sys.modules`, `loadAddon()` imports the add-on package as "omnitools".
+"""
+
+import os
+import sys
+import copy
+import array
+import types
+import importlib.util
+
+import numpy as np
+
+ADDON_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Vector(list):
+	"""
+	Stand-in for `mathutils.Vector`: a list with element-wise arithmetic.
+	"""
+	def __add__(self, other):
+		return Vector(a + b for a, b in zip(self, other))
+
+	def __sub__(self, other):
+		return Vector(a - b for a, b in zip(self, other))
+
+	def __iadd__(self, other):
+		self[:] = self + other
+		return self
+
+	def __isub__(self, other):
+		self[:] = self - other
+		return self
+
+	def copy(self):
+		return Vector(self)
+
+	def to_tuple(self):
+		return tuple(self)
+
+
+class Collection(object):
+	"""
+	Stand-in for a `bpy_prop_collection` of mesh elements (vertices, edges, loops, polygons).
+	Attributes are kept as numpy arrays with one row per element.
+	"""
+	def __init__(self, count, **attributes):
+		self.count = count
+		self.attributes = attributes
+
+	def __len__(self):
+		return self.count
+
+	def foreach_get(self, name, buffer):
+		values = self.attributes[name].ravel()
+		if isinstance(buffer, list):
+			buffer[:] = values.tolist()
+		elif isinstance(buffer, array.array):
+			buffer[:] = array.array(buffer.typecode, values.tolist())
+		else:
+			buffer[:] = values
+
+	def foreach_set(self, name, buffer):
+		old = self.attributes[name]
+		self.attributes[name] = np.asarray(buffer, dtype=old.dtype).reshape(old.shape)
+
+
+class Vertices(Collection):
+	"""
+	Stand-in for `mesh.vertices`. Elements are made on access, with the group memberships
+	taken from the vertex groups of the object using the mesh.
+	"""
+	owner = None
+
+	def __getitem__(self, index):
+		groups = self.owner.vertex_groups if self.owner else ()
+		return types.SimpleNamespace(index=index, groups=[types.SimpleNamespace(group=group.index, weight=group.weights[index])
+														  for group in groups if index in group.weights])
+
+	def __iter__(self):
+		return (self[i] for i in range(self.count))
+
+
+class Mesh(object):
+	"""
+	Stand-in for `bpy.types.Mesh`.
+	:param coords: float array (N, 3)
+	:param edges: int array (E, 2)
+	:param faces: int array (F, k) of vertex indices, all faces have k vertices
+	"""
+	def __init__(self, coords, edges, faces, name="Mesh"):
+		self.name = name
+		coords = np.asarray(coords, dtype=np.float32)
+		edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+		faces = np.asarray(faces, dtype=np.int32)
+		corners = faces.shape[1] if faces.ndim == 2 else 0
+		self.vertices = Vertices(len(coords), co=coords, select=np.zeros(len(coords), dtype=bool))
+		self.edges = Collection(len(edges), vertices=edges, select=np.zeros(len(edges), dtype=bool))
+		self.loops = Collection(faces.size, vertex_index=faces.ravel())
+		self.polygons = Collection(len(faces), loop_start=np.arange(len(faces), dtype=np.int32) * corners,
+								   loop_total=np.full(len(faces), corners, dtype=np.int32),
+								   material_index=np.zeros(len(faces), dtype=np.int32),
+								   select=np.zeros(len(faces), dtype=bool))
+
+		self.use_fake_user = False
+		self.properties = dict()
+
+	def as_pointer(self):
+		return id(self)
+
+	def update(self, *args, **kwargs):
+		pass
+
+	@property
+	def users(self):
+		return sum(obj.data is self for obj in sys.modules["bpy"].data.objects) + self.use_fake_user
+
+	def copy(self):
+		"""
+		Copies the mesh with its ID properties, the copy gets a free name and is added to `bpy.data.meshes`.
+		"""
+		result = copy.copy(self)
+		for name in ("vertices", "edges", "loops", "polygons"):
+			collection = copy.copy(getattr(self, name))
+			collection.attributes = {key: value.copy() for key, value in collection.attributes.items()}
+			setattr(result, name, collection)
+		result.vertices.owner = None
+		result.use_fake_user = False
+		result.properties = copy.deepcopy(self.properties)
+		meshes = sys.modules["bpy"].data.meshes
+		n = 1
+		result.name = "{0}.{1:03}".format(self.name, n)
+		while result.name in meshes:
+			n += 1
+			result.name = "{0}.{1:03}".format(self.name, n)
+		meshes.append(result)
+		return result
+
+	# ID properties
+	def get(self, key, default=None):
+		return self.properties.get(key, default)
+
+	def __getitem__(self, key):
+		return self.properties[key]
+
+	def __setitem__(self, key, value):
+		self.properties[key] = IDPropertyGroup(copy.deepcopy(value)) if isinstance(value, dict) else value
+
+	def __delitem__(self, key):
+		del self.properties[key]
+
+	def __contains__(self, key):
+		return key in self.properties
+
+
+class IDPropertyGroup(dict):
+	"""
+	Stand-in for a dict stored as an ID property.
+	"""
+	def to_dict(self):
+		return copy.deepcopy(dict(self))
+
+
+class Meshes(list):
+	"""
+	Stand-in for `bpy.data.meshes`, indexed and searched by name.
+	"""
+	def __getitem__(self, key):
+		if isinstance(key, str):
+			for mesh in self:
+				if mesh.name == key:
+					return mesh
+			raise KeyError(key)
+		return list.__getitem__(self, key)
+
+	def __contains__(self, name):
+		return any(mesh.name == name for mesh in self)
+
+	def get(self, name, default=None):
+		return self[name] if name in self else default
+
+
+class VertexGroup(object):
+	"""
+	Stand-in for `bpy.types.VertexGroup`. Like the real one, `weight` raises RuntimeError
+	for vertices that are not in the group.
+	"""
+	def __init__(self, name, index=0, id_data=None):
+		self.name = name
+		self.index = index
+		self.id_data = id_data
+		self.weights = dict()
+
+	def weight(self, index):
+		try:
+			return self.weights[index]
+		except KeyError:
+			raise RuntimeError("Vertex not in group")
+
+	def add(self, indices, weight, type):
+		for index in indices:
+			self.weights[index] = weight
+
+	def remove(self, indices):
+		for index in indices:
+			self.weights.pop(index, None)
+
+
+class VertexGroups(list):
+	def __init__(self, id_data=None):
+		list.__init__(self)
+		self.id_data = id_data
+		self.active = None
+
+	def new(self, name="Group"):
+		group = VertexGroup(name, len(self), self.id_data)
+		self.append(group)
+		self.active = group
+		return group
+
+	def get(self, name, default=None):
+		for group in self:
+			if group.name == name:
+				return group
+		return default
+
+
+class Object(object):
+	def __init__(self, data, name="Object"):
+		self.name = name
+		self.data = data
+		self.type = 'MESH'
+		self.mode = 'OBJECT'
+		self.select = True
+		self.location = Vector((0.0, 0.0, 0.0))
+		self.rotation_euler = Vector((0.0, 0.0, 0.0))
+		self.scale = Vector((1.0, 1.0, 1.0))
+		self.vertex_groups = VertexGroups(self)
+		self.material_slots = []
+		data.vertices.owner = self
+
+
+class _Anything(object):
+	"""
+	Accepts any attribute access and call, e.g. `bpy.ops.object.mode_set(mode="EDIT")`.
+	"""
+	def __getattr__(self, name):
+		return _Anything()
+
+	def __call__(self, *args, **kwargs):
+		return {'FINISHED'}
+
+
+def _property(default):
+	def factory(*args, **kwargs):
+		if "default" in kwargs:
+			return kwargs["default"]
+		if "items" in kwargs:
+			# dynamic items are a callback, there's no context to call it with
+			return kwargs["items"][0][0] if not callable(kwargs["items"]) else ""
+		return default
+	return factory
+
+
+class SceneObjects(list):
+	"""
+	Stand-in for `scene.objects`.
+	"""
+	active = None
+
+	def link(self, obj):
+		self.append(obj)
+
+
+class Operator(object):
+	"""
+	Stand-in for `bpy.types.Operator`. Reports are kept in `reports`.
+	"""
+	def report(self, type, message):
+		self.__dict__.setdefault("reports", []).append((type, message))
+
+
+def makeContext(objects, **scene_settings):
+	"""
+	Returns a stand-in context with the objects in the scene, the first one active.
+	Also becomes `bpy.context`, and the objects and their meshes become `bpy.data`.
+	:param scene_settings: values of the add-on's scene properties
+	"""
+	scene_objects = SceneObjects(objects)
+	scene_objects.active = objects[0] if objects else None
+	scene = types.SimpleNamespace(objects=scene_objects, omnitools_processes=os.cpu_count() or 1,
+								  weight_mirror_algorithm="spatial_hash", weight_mirror_axis="x",
+								  weight_mirror_negative=False, weight_mirror_resolution=14,
+								  weight_mirror_all_groups=False, weight_mirror_group_filter="",
+								  weight_mirror_memory_limit=512)
+	for name, value in scene_settings.items():
+		setattr(scene, name, value)
+
+	context = types.SimpleNamespace(scene=scene, active_object=scene_objects.active, object=scene_objects.active,
+									tool_settings=types.SimpleNamespace(mesh_select_mode=(True, False, False)),
+									window_manager=_Anything(), window=None, area=None)
+	bpy = sys.modules["bpy"]
+	bpy.context = context
+	bpy.data.objects = list(objects)
+	bpy.data.meshes = Meshes(obj.data for obj in objects)
+	return context
+
+
+def install():
+	"""
+	Puts the stand-in modules into `sys.modules`.
+	"""
+	bpy = types.ModuleType("bpy")
+	bpy.props = types.ModuleType("bpy.props")
+	for name, default in (("FloatProperty", 0.0), ("IntProperty", 0), ("BoolProperty", False), ("StringProperty", ""),
+						  ("EnumProperty", None), ("FloatVectorProperty", (0.0, 0.0, 0.0))):
+		setattr(bpy.props, name, _property(default))
+	bpy.types = types.SimpleNamespace(Operator=Operator, Panel=object, Scene=type("Scene", (), {}))
+	bpy.utils = _Anything()
+	bpy.ops = _Anything()
+	bpy.path = types.SimpleNamespace(basename=os.path.basename, ensure_ext=lambda path, ext: path)
+	bpy.data = types.SimpleNamespace(objects=[], meshes=Meshes(), scenes=[], filepath="", is_dirty=False)
+	handlers = types.ModuleType("bpy.app.handlers")
+	handlers.persistent = lambda func: func
+	handlers.scene_update_post = []
+	handlers.load_post = []
+	bpy.app = types.ModuleType("bpy.app")
+	bpy.app.handlers = handlers
+	bpy.app.binary_path = "blender"
+	bpy.context = None
+
+	mathutils = types.ModuleType("mathutils")
+	mathutils.Vector = Vector
+
+	sys.modules.update({"bpy": bpy, "bpy.props": bpy.props, "bpy.app": bpy.app, "bpy.app.handlers": handlers,
+						"bmesh": types.ModuleType("bmesh"), "mathutils": mathutils})
+
+
+def loadAddon(name="omnitools"):
+	"""
+	Installs the stand-ins and imports the add-on package under `name`.
+	"""
+	if name in sys.modules:
+		return sys.modules[name]
+	install()
+	spec = importlib.util.spec_from_file_location(name, os.path.join(ADDON_ROOT, "__init__.py"),
+												  submodule_search_locations=[ADDON_ROOT])
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[name] = module
+	spec.loader.exec_module(module)
+	return module
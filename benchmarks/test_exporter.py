@@ -0,0 +1,85 @@
+"""
+Checks the background export jobs with a stub executable in place of Blender.
+
+	python -m pytest benchmarks
+"""
+
+import os
+import sys
+import stat
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standin
+
+# records its arguments in the output file like the worker would write the .dae, fails for the scene "broken"
+STUB = """#!{python}
+import sys
+args = sys.argv[1:]
+if args[3] == "broken":
+	sys.exit(3)
+with open(args[-1], "w") as f:
+	f.write("\\n".join(args))
+"""
+
+
+def makeStub(directory):
+	path = os.path.join(directory, "blender")
+	with open(path, "w") as f:
+		f.write(STUB.format(python=sys.executable))
+	os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+	return path
+
+
+def test_runJobs(tmp_path):
+	standin.loadAddon()
+	standin.makeContext([])
+	from omnitools import exporter
+
+	directory = str(tmp_path)
+	binary = makeStub(directory)
+	names = ("Scene", "broken", "Scene.001")
+	commands = [exporter.exportCommand(binary, "file.blend", name, os.path.join(directory, name + ".dae")) for name in names]
+
+	assert exporter.runJobs(commands) == [0, 3, 0]
+
+	for name in ("Scene", "Scene.001"):
+		with open(os.path.join(directory, name + ".dae")) as f:
+			assert f.read().split("\n") == ["--background", "file.blend", "--scene", name, "--python",
+											exporter.WORKER_SCRIPT, "--", os.path.join(directory, name + ".dae")]
+	assert not os.path.exists(os.path.join(directory, "broken.dae"))
+
+
+class FakeStruct(object):
+	"""
+	Struct with RNA properties described by (identifier, type, fixed type) tuples.
+	"""
+	def __init__(self, properties, **values):
+		self.bl_rna = types.SimpleNamespace(properties=[
+			types.SimpleNamespace(identifier=identifier, type=kind, fixed_type=types.SimpleNamespace(identifier=fixed))
+			for identifier, kind, fixed in properties])
+		self.__dict__.update(values)
+
+
+def makeObject(name, parent=None, modifier_targets=(), constraint_targets=()):
+	modifiers = [FakeStruct([("object", "POINTER", "Object"), ("levels", "INT", None)], object=target, levels=2)
+				 for target in modifier_targets]
+	constraints = [FakeStruct([("target", "POINTER", "Object")], target=target) for target in constraint_targets]
+	return types.SimpleNamespace(name=name, parent=parent, modifiers=modifiers, constraints=constraints)
+
+
+def test_exportedObjects():
+	standin.loadAddon()
+	from omnitools import exporter
+
+	root = makeObject("Root")
+	armature = makeObject("Armature", parent=root)
+	target = makeObject("Target")
+	cutter = makeObject("Cutter", constraint_targets=[target])
+	body = makeObject("Body", modifier_targets=[armature, cutter])
+	other = makeObject("Other")
+	scene = types.SimpleNamespace(object_bases=[types.SimpleNamespace(object=body, select=True),
+												types.SimpleNamespace(object=other, select=False)])
+
+	assert [obj.name for obj in exporter.exportedObjects(scene)] == ["Armature", "Body", "Cutter", "Root", "Target"]
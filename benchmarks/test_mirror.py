@@ -0,0 +1,59 @@
+"""
+Checks the side names of vertex groups.
+
+	python -m pytest benchmarks
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standin
+
+
+@pytest.mark.parametrize("name, expected", [
+	("hand.L", "hand.R"),
+	("hand.r", "hand.l"),
+	("arm_R", "arm_L"),
+	("Upper Arm-L", "Upper Arm-R"),
+	("L_arm", "R_arm"),
+	("r.arm", "l.arm"),
+	("thigh_L_twist", "thigh_R_twist"),
+	("arm.L.fk", "arm.R.fk"),
+	("armLeft", "armRight"),
+	("Right_hand", "Left_hand"),
+	("left hand", "right hand"),
+	("LEFT_ARM", "RIGHT_ARM"),
+	# the number of a duplicated name stays at the end
+	("hand.L.001", "hand.R.001"),
+	("hand.001", None),
+	("Spine", None),
+	("Lamp", None),
+	("Leftover", None),
+])
+def test_mirroredGroupName(name, expected):
+	standin.loadAddon()
+	from omnitools.mirror import mirroredGroupName
+
+	assert mirroredGroupName(name) == expected
+	if expected is not None:
+		assert mirroredGroupName(expected) == name
+
+
+@pytest.mark.parametrize("name, expected", [
+	("hand.L", True),
+	("L_hand", True),
+	("hand.L.001", True),
+	("Right_hand", True),
+	("Spine", False),
+	("Lamp", False),
+	("Bl.001", False),
+])
+def test_hasSideToken(name, expected):
+	standin.loadAddon()
+	from omnitools.mirror import hasSideToken
+
+	assert hasSideToken(name) == expected
@@ -0,0 +1,150 @@
+"""
+Checks the mesh snapshots on stand-in meshes: delta encoding, restoring and pruning.
+
+	python -m pytest benchmarks
+"""
+
+import os
+import sys
+import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standin
+import meshes
+
+
+def makeObject():
+	coords, edges, faces = meshes.symmetricGrid(400)
+	obj = standin.Object(standin.Mesh(coords, edges, faces, name="Grid"), name="Grid")
+	standin.makeContext([obj])
+	return obj
+
+
+def readCoords(mesh):
+	return mesh.vertices.attributes["co"].copy()
+
+
+def moveVertices(mesh, indices, offset):
+	coords = readCoords(mesh)
+	coords[indices] += offset
+	mesh.vertices.foreach_set("co", coords.ravel())
+	return coords
+
+
+def test_delta_roundtrip(monkeypatch):
+	standin.loadAddon()
+	from omnitools import snapshots, kernels
+
+	base = np.random.RandomState(0).uniform(-1, 1, (1000, 3)).astype(np.float32)
+	coords = base.copy()
+	coords[::7] += 0.001
+	data = snapshots.encodeDelta(coords, base)
+	assert snapshots.decodeDelta(data, base).tobytes() == coords.tobytes()
+	# mostly unchanged vertices compress well
+	assert len(data) < coords.nbytes // 4
+
+	monkeypatch.setattr(kernels, "np", None)
+	base_array = array.array("f", base.ravel().tolist())
+	coords_array = array.array("f", coords.ravel().tolist())
+	assert snapshots.encodeDelta(coords_array, base_array) == data
+	assert snapshots.decodeDelta(data, base_array) == coords_array
+
+
+def test_take_and_restore():
+	standin.loadAddon()
+	from omnitools import snapshots
+	import bpy
+
+	obj = makeObject()
+	mesh = obj.data
+	first_coords = readCoords(mesh)
+	first = snapshots.takeSnapshot(mesh)
+	second_coords = moveVertices(mesh, [0, 5, 9], 0.5)
+	second = snapshots.takeSnapshot(mesh)
+
+	registry = snapshots.getRegistry(mesh)
+	assert snapshots.listSnapshots(mesh) == [first, second]
+	assert registry[first]["kind"] == "full" and registry[second]["kind"] == "delta"
+	assert registry[second]["base"] == first
+	base_mesh = bpy.data.meshes[registry[first]["mesh"]]
+	assert base_mesh.use_fake_user and snapshots.REGISTRY_KEY not in base_mesh
+
+	moveVertices(mesh, [1, 2], -0.3)
+	assert snapshots.restoreSnapshot(obj, second)
+	assert np.array_equal(readCoords(obj.data), second_coords)
+	assert snapshots.restoreSnapshot(obj, first)
+	assert np.array_equal(readCoords(obj.data), first_coords)
+	assert obj.data is mesh
+
+	assert not snapshots.restoreSnapshot(obj, "missing")
+	# the base mesh was renamed or purged
+	bpy.data.meshes.remove(base_mesh)
+	assert not snapshots.restoreSnapshot(obj, second)
+
+
+def test_restore_other_topology():
+	standin.loadAddon()
+	from omnitools import snapshots
+
+	obj = makeObject()
+	mesh = obj.data
+	coords = readCoords(mesh)
+	name = snapshots.takeSnapshot(mesh)
+	edges = mesh.edges.attributes["vertices"]
+	mesh.edges.foreach_set("vertices", edges[::-1].ravel())
+
+	assert snapshots.restoreSnapshot(obj, name)
+	assert obj.data is not mesh
+	assert obj.data.name == "Grid" and mesh.name == "Grid_old"
+	assert np.array_equal(readCoords(obj.data), coords)
+	assert not obj.data.use_fake_user
+	# the snapshots went with the object
+	assert snapshots.listSnapshots(obj.data) == [name]
+	assert snapshots.listSnapshots(mesh) == []
+
+
+def test_prune():
+	standin.loadAddon()
+	from omnitools import snapshots
+	import bpy
+
+	obj = makeObject()
+	mesh = obj.data
+	full = snapshots.takeSnapshot(mesh)
+	deltas = []
+	for i in range(3):
+		moveVertices(mesh, [i], 0.1)
+		deltas.append(snapshots.takeSnapshot(mesh))
+	base_name = snapshots.getRegistry(mesh)[full]["mesh"]
+
+	# the full snapshot has delta ones based on it, the oldest of those go first
+	assert snapshots.pruneSnapshots(mesh, keep=2) == 2
+	assert snapshots.listSnapshots(mesh) == [full, deltas[2]]
+
+	assert snapshots.pruneSnapshots(mesh, keep=0, protect=deltas[2]) == 0
+	assert snapshots.listSnapshots(mesh) == [full, deltas[2]]
+
+	assert snapshots.pruneSnapshots(mesh, budget=0, protect=full) == 1
+	assert snapshots.listSnapshots(mesh) == [full]
+	assert base_name in bpy.data.meshes
+
+	assert snapshots.pruneSnapshots(mesh, keep=0) == 1
+	assert snapshots.listSnapshots(mesh) == []
+	assert base_name not in bpy.data.meshes
+
+
+def test_budget():
+	standin.loadAddon()
+	from omnitools import snapshots
+
+	obj = makeObject()
+	mesh = obj.data
+	# the new snapshot stays even if it alone exceeds the budget
+	first = snapshots.takeSnapshot(mesh, budget=1)
+	assert snapshots.listSnapshots(mesh) == [first]
+	moveVertices(mesh, [0], 0.1)
+	second = snapshots.takeSnapshot(mesh, budget=1)
+	assert snapshots.listSnapshots(mesh) == [first, second]
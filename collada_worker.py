@@ -0,0 +1,8 @@
+# Run by a background Blender instance for every scene in "Export selected to Collada per scene":
+# blender --background file.blend --scene SceneName --python collada_worker.py -- output.dae
+
+import sys
+import bpy
+
+filepath = sys.argv[sys.argv.index("--") + 1]
+bpy.ops.wm.collada_export(filepath=filepath, apply_modifiers=True, selected=True)
@@ -0,0 +1,208 @@
+import os
+import array
+import hashlib
+import itertools
+import subprocess
+
+from .pool import getPool
+
+# name of the file that keeps the content hashes of exported scenes, inside the output directory
+MANIFEST_NAME = ".omnitools_dae.json"
+
+# script run by the background Blender instances
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "collada_worker.py")
+
+
+# properties that change without the data changing (node sizes change on redraw), or refer to the session
+VOLATILE_PROPERTIES = {"rna_type", "users", "tag", "select", "session_uid", "original", "use_fake_user", "dimensions"}
+
+
+def _plain(value):
+	"""
+	Turns an RNA property value into something with a stable `repr`: data blocks and named structs
+	become their names, vectors and matrices tuples, enum sets sorted tuples.
+	"""
+	if value is None or isinstance(value, (bool, int, float, str)):
+		return value
+	if isinstance(value, (set, frozenset)):
+		return tuple(sorted(value))
+	name = getattr(value, "name", None)
+	if isinstance(name, str):
+		return name
+	try:
+		return tuple(_plain(item) for item in value)
+	except TypeError:
+		# an unnamed struct, its address would differ every session
+		return type(value).__name__
+
+
+def rnaValues(struct):
+	"""
+	Returns the values of all RNA properties of the struct but collections, e.g. every setting of a modifier.
+	Pointers are represented by the names of the structs they point to.
+	"""
+	if struct is None:
+		return None
+	values = []
+	for prop in struct.bl_rna.properties:
+		identifier = prop.identifier
+		if prop.type == 'COLLECTION' or identifier in VOLATILE_PROPERTIES or identifier.startswith("is_"):
+			continue
+		try:
+			values.append((identifier, _plain(getattr(struct, identifier))))
+		except AttributeError:
+			continue
+	return values
+
+
+def _readArray(collection, attribute, typecode, width=1):
+	"""
+	Reads an attribute of all elements with `foreach_get`. Booleans go through a list.
+	:return: bytes
+	"""
+	if typecode == "?":
+		values = [False] * (len(collection) * width)
+		collection.foreach_get(attribute, values)
+		return bytes(values)
+	values = array.array(typecode, bytes(len(collection) * width * array.array(typecode).itemsize))
+	collection.foreach_get(attribute, values)
+	return values.tobytes()
+
+
+def meshHash(result, obj):
+	"""
+	Updates the hash with the mesh data of the object: geometry, smoothing, UV maps, vertex colors,
+	custom normals, vertex group weights and shape keys.
+	"""
+	from .weights import readGroups
+
+	mesh = obj.data
+	for collection, attribute, typecode, width in ((mesh.vertices, "co", "f", 3), (mesh.edges, "vertices", "i", 2),
+												   (mesh.edges, "use_edge_sharp", "?", 1), (mesh.edges, "use_seam", "?", 1),
+												   (mesh.loops, "vertex_index", "i", 1), (mesh.polygons, "loop_start", "i", 1),
+												   (mesh.polygons, "loop_total", "i", 1), (mesh.polygons, "material_index", "i", 1),
+												   (mesh.polygons, "use_smooth", "?", 1)):
+		result.update(_readArray(collection, attribute, typecode, width))
+
+	for layer in mesh.uv_layers:
+		result.update(layer.name.encode())
+		result.update(_readArray(layer.data, "uv", "f", 2))
+	for layer in mesh.vertex_colors:
+		result.update(layer.name.encode())
+		result.update(_readArray(layer.data, "color", "f", len(layer.data[0].color) if len(layer.data) else 3))
+	if getattr(mesh, "has_custom_normals", False):
+		mesh.calc_normals_split()
+		result.update(_readArray(mesh.loops, "normal", "f", 3))
+
+	groups = readGroups(mesh, [group.index for group in obj.vertex_groups])
+	for group in obj.vertex_groups:
+		weights, mask = groups[group.index]
+		result.update(group.name.encode())
+		result.update(weights.tobytes())
+		result.update(bytes(mask))
+
+	if mesh.shape_keys is not None:
+		result.update(repr(rnaValues(mesh.shape_keys)).encode())
+		for key_block in mesh.shape_keys.key_blocks:
+			result.update(repr(rnaValues(key_block)).encode())
+			result.update(_readArray(key_block.data, "co", "f", 3))
+
+
+def materialValues(material):
+	"""
+	Returns the settings of the material, its nodes with their input values and its texture slots.
+	"""
+	if material is None:
+		return None
+	values = [rnaValues(material)]
+	if material.node_tree is not None:
+		for node in material.node_tree.nodes:
+			values.append(rnaValues(node))
+			values.extend(rnaValues(socket) for socket in node.inputs)
+	for slot in getattr(material, "texture_slots", ()):
+		if slot is not None:
+			values.append((rnaValues(slot), rnaValues(slot.texture)))
+	return values
+
+
+def referencedObjects(obj):
+	"""
+	Returns the objects the result of the object depends on: its parent and the objects its modifiers
+	and constraints point to (armatures, boolean operands, deform and constraint targets).
+	"""
+	result = [obj.parent] if obj.parent is not None else []
+	for struct in itertools.chain(obj.modifiers, obj.constraints):
+		for prop in struct.bl_rna.properties:
+			if prop.type == 'POINTER' and getattr(prop.fixed_type, "identifier", None) == "Object":
+				value = getattr(struct, prop.identifier, None)
+				if value is not None:
+					result.append(value)
+	return result
+
+
+def exportedObjects(scene):
+	"""
+	Returns the selected objects of the scene and, recursively, the objects they depend on, sorted by name.
+	"""
+	found = dict()
+	stack = [base.object for base in scene.object_bases if base.select]
+	while stack:
+		obj = stack.pop()
+		if obj.name in found:
+			continue
+		found[obj.name] = obj
+		stack.extend(referencedObjects(obj))
+	return [found[name] for name in sorted(found)]
+
+
+def sceneHash(scene):
+	"""
+	Returns a hash of everything that gets into the Collada export of the scene's selected objects, with
+	modifiers applied: the current frame, and for the selected objects and the objects they depend on
+	(see `referencedObjects`) object settings and transforms, parenting, modifier and constraint settings,
+	materials, the armature pose, curve and lattice points and the mesh data (see `meshHash`).
+	Contents of image files are not part of it.
+	"""
+	result = hashlib.sha1()
+	result.update(repr(scene.frame_current).encode())
+	selected = set(base.object.name for base in scene.object_bases if base.select)
+	for obj in exportedObjects(scene):
+		result.update(repr((obj.name in selected, rnaValues(obj), [tuple(row) for row in obj.matrix_world],
+							[rnaValues(modifier) for modifier in obj.modifiers],
+							[rnaValues(constraint) for constraint in obj.constraints],
+							[(rnaValues(slot), materialValues(slot.material)) for slot in obj.material_slots],
+							rnaValues(obj.data))).encode())
+		if obj.pose is not None:
+			result.update(repr([rnaValues(bone) for bone in obj.pose.bones]).encode())
+		if obj.type == 'ARMATURE':
+			result.update(repr([rnaValues(bone) for bone in obj.data.bones]).encode())
+		elif obj.type == 'MESH':
+			meshHash(result, obj)
+		elif obj.type == 'LATTICE':
+			result.update(repr([tuple(point.co_deform) for point in obj.data.points]).encode())
+		elif obj.type in ('CURVE', 'SURFACE'):
+			for spline in obj.data.splines:
+				result.update(repr((rnaValues(spline), [rnaValues(point) for point in spline.points],
+									[rnaValues(point) for point in spline.bezier_points])).encode())
+	return result.hexdigest()
+
+
+def exportCommand(binary, blend_path, scene_name, filepath):
+	"""
+	Returns the command line that exports selected objects of the scene in a background Blender.
+	:param binary: Blender executable, or anything accepting the same arguments
+	"""
+	return [binary, "--background", blend_path, "--scene", scene_name,
+			"--python", WORKER_SCRIPT, "--", filepath]
+
+
+def runJobs(commands):
+	"""
+	Runs the commands in the shared pool, so there are at most "Processes" of them at once.
+	:return: list of return codes, in the order of `commands`
+	"""
+	def run(command):
+		with open(os.devnull, "w") as devnull:
+			return subprocess.call(command, stdout=devnull, stderr=devnull)
+
+	return list(getPool().map(run, commands))
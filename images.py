@@ -0,0 +1,36 @@
+import os
+
+# name of the file that keeps the modification times of saved images, inside the output directory
+MANIFEST_NAME = ".omnitools_images.json"
+
+
+def getActiveImages(objects):
+	"""
+	Collects the images of the active image texture nodes in every material of given objects.
+	Every image is returned once, even if it is used in several slots.
+	Slots without material, node tree or active image node are skipped.
+	"""
+	result = []
+	seen = set()
+	for obj in objects:
+		for slot in obj.material_slots:
+			mat = slot.material
+			if mat is None or mat.node_tree is None:
+				continue
+			node = mat.node_tree.nodes.active
+			imag = getattr(node, "image", None)
+			if imag is None or imag.name in seen:
+				continue
+			seen.add(imag.name)
+			result.append(imag)
+	return result
+
+
+def fileTime(filepath):
+	"""
+	:return: modification time of the file, None if it doesn't exist
+	"""
+	try:
+		return os.path.getmtime(filepath)
+	except OSError:
+		return None
@@ -0,0 +1,159 @@
+"""
+Output of many transformed copies of an object as a single object: either all the copies merged
+into one mesh, or a mesh with a face per copy that instances the object with dupli-faces.
+"""
+
+import math
+
+import bpy
+from mathutils import Euler
+
+from . import kernels
+from .utils import getNumpy
+
+# corners of the face made per instance for dupli-faces. Blender turns a face into an instance
+# matrix by its normal (Z axis), its first edge (X axis), its center and the root of its area (scale),
+# so this one gives the identity.
+FACE_CORNERS = ((-1.0 / 3, -1.0 / 3, 0.0), (2.0 / 3, -1.0 / 3, 0.0), (-1.0 / 3, 2.0 / 3, 0.0))
+
+
+def eulerMode(obj):
+	"""
+	Returns the Euler order of the object's rotation, XYZ if it is not rotated by Euler angles.
+	"""
+	return obj.rotation_mode if len(obj.rotation_mode) == 3 else 'XYZ'
+
+
+def instanceMatrices(rotations, scales, rotation_mode='XYZ'):
+	"""
+	Returns the rotation and scale of every instance as a 3x3 matrix (list of rows).
+	:param rotations: Euler angles of the instances
+	:param scales: scales of the instances along the local axes
+	"""
+	# scaling along the local axes scales the columns, that is every row by the scale of its instance
+	rows = kernels.fromList([row for rotation in rotations for row in Euler(rotation, rotation_mode).to_matrix()])
+	factors = kernels.fromList([scale for scale in scales for row in range(3)])
+	rows = kernels.toList(kernels.scaled(rows, factors))
+	return [rows[i:i + 3] for i in range(0, len(rows), 3)]
+
+
+def transformAll(vectors, matrices, locations):
+	"""
+	Transforms the vectors by every matrix and location.
+	:param vectors: array of vectors, see `kernels`
+	:param matrices: 3x3 matrices, one per instance
+	:return: array of the vectors of all the instances, instance after instance
+	"""
+	np = getNumpy()
+	if np is not None:
+		matrices = np.asarray(matrices, dtype=np.float32).reshape(-1, 3, 3)
+		locations = np.asarray(locations, dtype=np.float32).reshape(-1, 1, 3)
+		vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, 3)
+		return (np.einsum("nij,vj->nvi", matrices, vectors) + locations).reshape(-1, 3)
+
+	rows = kernels.toList(vectors)
+	result = []
+	for matrix, location in zip(matrices, locations):
+		for co in rows:
+			result.append([sum(matrix[i][j] * co[j] for j in range(3)) + location[i] for i in range(3)])
+	return kernels.fromList(result)
+
+
+def tiled(values, count, step=0):
+	"""
+	Returns `count` copies of the flat sequence one after another, the i-th one increased by i*`step`.
+	Used to repeat the indices of a mesh for every instance.
+	"""
+	np = getNumpy()
+	if np is not None:
+		values = np.asarray(values).ravel()
+		return (values.reshape(1, -1) + (np.arange(count, dtype=values.dtype) * step).reshape(-1, 1)).ravel()
+	values = list(values)
+	return [value + i * step for i in range(count) for value in values]
+
+
+def _readFloats(collection, attribute, width):
+	np = getNumpy()
+	if np is not None:
+		result = np.empty(len(collection) * width, dtype=np.float32)
+	else:
+		result = [0.0] * (len(collection) * width)
+	collection.foreach_get(attribute, result)
+	return result
+
+
+def buildMergedMesh(source, name, locations, rotations, scales, rotation_mode='XYZ'):
+	"""
+	Makes a mesh with a transformed copy of `source` per instance. The index arrays of the source are
+	read once and repeated with offsets, so the mesh is filled with a few `foreach_set` calls.
+	UV maps, materials and smooth shading are kept.
+	:return: the new mesh
+	"""
+	count = len(locations)
+	vertex_count = len(source.vertices)
+	loop_count = len(source.loops)
+
+	coords = transformAll(kernels.readVectors(source.vertices), instanceMatrices(rotations, scales, rotation_mode), locations)
+
+	mesh = bpy.data.meshes.new(name)
+	mesh.vertices.add(vertex_count * count)
+	kernels.writeVectors(mesh.vertices, coords)
+
+	mesh.edges.add(len(source.edges) * count)
+	mesh.edges.foreach_set("vertices", tiled(kernels.readIndices(source.edges, "vertices", 2), count, vertex_count))
+
+	mesh.loops.add(loop_count * count)
+	mesh.loops.foreach_set("vertex_index", tiled(kernels.readIndices(source.loops, "vertex_index"), count, vertex_count))
+
+	mesh.polygons.add(len(source.polygons) * count)
+	mesh.polygons.foreach_set("loop_start", tiled(kernels.readIndices(source.polygons, "loop_start"), count, loop_count))
+	mesh.polygons.foreach_set("loop_total", tiled(kernels.readIndices(source.polygons, "loop_total"), count))
+	mesh.polygons.foreach_set("material_index", tiled(kernels.readIndices(source.polygons, "material_index"), count))
+	smooth = [False] * len(source.polygons)
+	source.polygons.foreach_get("use_smooth", smooth)
+	mesh.polygons.foreach_set("use_smooth", smooth * count)
+
+	mesh.update(calc_edges=True)
+
+	for uv_layer in source.uv_layers:
+		uvs = _readFloats(uv_layer.data, "uv", 2)
+		mesh.uv_textures.new(uv_layer.name)
+		mesh.uv_layers[uv_layer.name].data.foreach_set("uv", tiled(uvs, count))
+
+	for material in source.materials:
+		mesh.materials.append(material)
+
+	return mesh
+
+
+def buildInstanceMesh(obj, name, locations, rotations, scales):
+	"""
+	Makes a mesh with a triangle per instance, for dupli-faces of `obj` with face scaling on.
+	The object keeps its own transform inside the instances, so the triangles carry only the rest:
+	the location, the rotation relative to the object's one, and the scale relative to its mean scale.
+	Instances get uniform scale, the mean of their scale along the axes.
+	:return: the new mesh
+	"""
+	count = len(locations)
+	base_location, base_rotation, base_scale = obj.matrix_world.decompose()
+	base_rotation = base_rotation.to_matrix().inverted()
+	base_scale = sum(base_scale) / 3.0 or 1.0
+	rotation_mode = eulerMode(obj)
+
+	matrices = []
+	for rotation, scale in zip(rotations, scales):
+		# the root of the area of a triangle with legs of sqrt(2) is 1
+		size = sum(scale) / 3.0 / base_scale * math.sqrt(2)
+		matrix = base_rotation * Euler(rotation, rotation_mode).to_matrix()
+		matrices.append([[matrix[row][column] * size for column in range(3)] for row in range(3)])
+
+	mesh = bpy.data.meshes.new(name)
+	mesh.vertices.add(3 * count)
+	kernels.writeVectors(mesh.vertices, transformAll(kernels.fromList(FACE_CORNERS), matrices, locations))
+	mesh.loops.add(3 * count)
+	mesh.loops.foreach_set("vertex_index", tiled(range(3), count, 3))
+	mesh.polygons.add(count)
+	mesh.polygons.foreach_set("loop_start", tiled([0], count, 3))
+	mesh.polygons.foreach_set("loop_total", [3] * count)
+	mesh.update(calc_edges=True)
+	return mesh
@@ -0,0 +1,161 @@
+"""
+Batched geometry operations on arrays of vectors.
+With numpy the arrays are float32 of shape (N, 3). Without it they are flat `array.array("f")`
+of length 3*N, and the same functions work on them in plain python.
+Large numpy arrays are split across the shared pool.
+"""
+
+import array
+import itertools
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+from .pool import chunkedMap
+
+
+def readVectors(collection, attribute="co"):
+	"""
+	Reads a 3D vector attribute of all elements (e.g. coordinates of `mesh.vertices`) with a single `foreach_get`.
+	"""
+	if np is not None:
+		result = np.empty(len(collection) * 3, dtype=np.float32)
+		collection.foreach_get(attribute, result)
+		return result.reshape(-1, 3)
+
+	result = array.array("f", bytes(len(collection) * 3 * 4))
+	collection.foreach_get(attribute, result)
+	return result
+
+
+def readIndices(collection, attribute, width=1):
+	"""
+	Reads an integer attribute of all elements (e.g. `vertices` of `mesh.edges`) with a single `foreach_get`.
+	:param width: amount of values per element
+	:return: int32 array of shape (N, width) with numpy, flat `array.array("i")` without it
+	"""
+	if np is not None:
+		result = np.empty(len(collection) * width, dtype=np.int32)
+		collection.foreach_get(attribute, result)
+		return result.reshape(-1, width)
+
+	result = array.array("i", bytes(len(collection) * width * 4))
+	collection.foreach_get(attribute, result)
+	return result
+
+
+def writeVectors(collection, vectors, attribute="co"):
+	"""
+	Writes a 3D vector attribute of all elements with a single `foreach_set`.
+	"""
+	collection.foreach_set(attribute, vectors.ravel() if np is not None else vectors)
+
+
+def count(vectors):
+	"""
+	Returns the amount of vectors in the array.
+	"""
+	return len(vectors) if np is not None else len(vectors) // 3
+
+
+def toList(vectors):
+	"""
+	Returns the vectors as a list of [x, y, z] lists. Pure python loops are faster on those than on arrays.
+	"""
+	if np is not None:
+		return vectors.tolist()
+	return [list(vectors[i:i + 3]) for i in range(0, len(vectors), 3)]
+
+
+def fromList(rows):
+	"""
+	Makes an array of vectors from a sequence of (x, y, z).
+	"""
+	if np is not None:
+		return np.array(rows, dtype=np.float32).reshape(-1, 3)
+	return array.array("f", itertools.chain.from_iterable(rows))
+
+
+def take(vectors, indices):
+	"""
+	Returns the vectors at given indices.
+	"""
+	if np is not None:
+		return vectors[indices]
+	return array.array("f", itertools.chain.from_iterable(vectors[3 * i:3 * i + 3] for i in indices))
+
+
+def toBytes(vectors):
+	return vectors.tobytes()
+
+
+def column(vectors, axis_index):
+	"""
+	Returns the coordinates along one axis.
+	"""
+	return vectors[:, axis_index] if np is not None else vectors[axis_index::3]
+
+
+def shifted(vectors, offset):
+	"""
+	Returns `vectors` - `offset`.
+	:param offset: (x, y, z)
+	"""
+	if np is not None:
+		offset = np.asarray(offset, dtype=np.float32)
+		return chunkedMap(lambda chunk: chunk - offset, vectors)
+	return array.array("f", (c - offset[i % 3] for i, c in enumerate(vectors)))
+
+
+def scaled(vectors, factors):
+	"""
+	Multiplies every vector by `factors` per axis.
+	:param factors: (x, y, z), or an array of as many vectors with the factors of each vector
+	"""
+	if np is not None:
+		factors = np.asarray(factors, dtype=np.float32)
+		if factors.ndim > 1:
+			return vectors * factors
+		return chunkedMap(lambda chunk: chunk * factors, vectors)
+	if len(factors) > 3:
+		return array.array("f", (c * f for c, f in zip(vectors, factors)))
+	return array.array("f", (c * factors[i % 3] for i, c in enumerate(vectors)))
+
+
+def mirrored(vectors, axis_index):
+	"""
+	Returns the vectors reflected by the plane perpendicular to the axis.
+	"""
+	if np is not None:
+		result = vectors.copy()
+		result[:, axis_index] *= -1
+		return result
+	result = array.array("f", vectors)
+	result[axis_index::3] = array.array("f", (-c for c in vectors[axis_index::3]))
+	return result
+
+
+def squaredDistances(vectors, pivot):
+	"""
+	Returns the squared distance from every vector to `pivot`.
+	:return: float array of length N
+	"""
+	if np is not None:
+		pivot = np.asarray(pivot, dtype=np.float32)
+		return chunkedMap(lambda chunk: ((chunk - pivot)**2).sum(axis=1), vectors)
+	px, py, pz = pivot
+	return array.array("f", ((x-px)**2 + (y-py)**2 + (z-pz)**2 for x, y, z in zip(vectors[0::3], vectors[1::3], vectors[2::3])))
+
+
+def beyond(vectors, axis_index, threshold, negative=False):
+	"""
+	Returns a mask of the vectors with the coordinate along the axis greater than `threshold`
+	(or less, if `negative`).
+	:return: bool array of length N, a list of bools without numpy
+	"""
+	values = column(vectors, axis_index)
+	if np is not None:
+		return chunkedMap(lambda chunk: chunk < threshold if negative else chunk > threshold, values)
+	return [c < threshold for c in values] if negative else [c > threshold for c in values]
@@ -0,0 +1,155 @@
+"""
+Live mirroring of weight painting. While it is on, the weights of the active group on the source side
+are compared with their previous snapshot once painting pauses, and only the changed ones are
+written to the symmetrical vertices. The symmetry map is computed once per mesh.
+Finding the changes still reads the whole source side, so on dense meshes the checks are spaced out
+in proportion to their cost, and the mirrored side lags behind.
+"""
+
+import time
+
+from bpy.app.handlers import persistent
+
+from .utils import getNumpy, getVertexCoordinates
+from .weights import readGroup, writeGroup
+
+# margin of the symmetry search, the default one of the mirror weights operator
+MARGIN = 0.00001
+
+# seconds without mesh updates after which painting is taken as paused and the weights are checked
+INTERVAL = 0.1
+
+# the pause is at least that many times the duration of the last check, so the checks take
+# no more than a fraction of the time on dense meshes
+COST_FACTOR = 4
+
+# the symmetry map and the weight snapshot of the mesh being painted
+_state = dict()
+# set while the handler writes weights, the updates it causes are its own
+_busy = False
+
+
+def buildPairMap(mesh, axis_index, negative):
+	"""
+	Finds the symmetrical vertices of the mesh, see `mirror.spatialHashPairs`.
+	:return: tuple (sources, targets), numpy arrays if available
+	"""
+	from . import kernels
+	from .mirror import quantizedPairs, spatialHashPairs
+
+	np = getNumpy()
+	coords = getVertexCoordinates(mesh)
+	if np is not None:
+		sources, targets, unmatched_sources, unmatched_targets = quantizedPairs(coords, axis_index, MARGIN, negative)
+		return np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+	sources, targets, unmatched_sources, unmatched_targets = spatialHashPairs(kernels.toList(coords), axis_index, MARGIN, negative)
+	return sources, targets
+
+
+def prepare(obj, group, axis_index, negative):
+	"""
+	Computes the symmetry map of the object's mesh, unless it is computed already, and takes the snapshot of the group.
+	"""
+	mesh = obj.data
+	key = (obj.name, mesh.as_pointer(), len(mesh.vertices), axis_index, negative)
+	if _state.get("key") != key:
+		_state.clear()
+		_state["key"] = key
+		_state["sources"], _state["targets"] = buildPairMap(mesh, axis_index, negative)
+	_state["group"] = group.name
+	_state["snapshot"] = readGroup(group, _state["sources"])
+
+
+def mirrorChanges(obj, group):
+	"""
+	Writes the weights of the source side vertices that changed since the last snapshot to their symmetrical vertices.
+	The target group is the counterpart of the active one (e.g. "hand.R" for "hand.L") if the object has it,
+	otherwise the active group itself.
+	"""
+	from .mirror import mirroredGroupName
+
+	np = getNumpy()
+	targets = _state["targets"]
+	weights, mask = readGroup(group, _state["sources"])
+	old_weights, old_mask = _state["snapshot"]
+	_state["snapshot"] = (weights, mask)
+
+	# a vertex may also have left or joined the group
+	if np is not None:
+		changed = np.flatnonzero((weights != old_weights) | (mask != old_mask))
+		changed_targets = targets[changed]
+		changed_weights = weights[changed]
+		changed_mask = mask[changed]
+	else:
+		changed = [i for i in range(len(weights)) if weights[i] != old_weights[i] or mask[i] != old_mask[i]]
+		changed_targets = [targets[i] for i in changed]
+		changed_weights = [weights[i] for i in changed]
+		changed_mask = [mask[i] for i in changed]
+	if not len(changed_targets):
+		return
+
+	counterpart_name = mirroredGroupName(group.name)
+	target_group = obj.vertex_groups.get(counterpart_name) if counterpart_name else None
+	writeGroup(target_group or group, changed_targets, changed_weights, changed_mask)
+	obj.data.update()
+	# the update above is not a stroke
+	_state["own_update"] = True
+
+
+@persistent
+def liveMirror(scene):
+	"""
+	Handler for `scene_update_post`. Mirrors the painted weights while the scene's "Live mirror" is on
+	and the active object is in weight paint mode. The symmetry map and the first snapshot are made
+	as soon as painting starts. The weights are not read during a stroke: they are checked once the mesh
+	was updated by painting and then left alone for `INTERVAL` seconds, or `COST_FACTOR` times
+	the duration of the last check if that is longer. Pending changes of a group are mirrored
+	right away when another group becomes active.
+	"""
+	global _busy
+	if _busy:
+		return
+
+	obj = scene.objects.active
+	if not getattr(scene, "weight_mirror_live", False) or obj is None or obj.type != 'MESH' or obj.mode != 'WEIGHT_PAINT':
+		_state.clear()
+		return
+	group = obj.vertex_groups.active
+	if group is None:
+		return
+
+	axis_index = "xyz".index(scene.weight_mirror_axis)
+	negative = scene.weight_mirror_negative
+	_busy = True
+	try:
+		key = (obj.name, obj.data.as_pointer(), len(obj.data.vertices), axis_index, negative)
+		if _state.get("key") != key or _state.get("group") != group.name:
+			# painting of the previously active group that was not mirrored yet, its snapshot is dropped below
+			previous = obj.vertex_groups.get(_state.get("group", ""))
+			if _state.get("key") == key and _state.get("dirty") and previous is not None:
+				_state["dirty"] = False
+				mirrorChanges(obj, previous)
+			prepare(obj, group, axis_index, negative)
+			return
+
+		now = time.perf_counter()
+		if obj.is_updated_data or obj.data.is_updated or obj.data.is_updated_data:
+			if not _state.pop("own_update", False):
+				_state["dirty"] = True
+				_state["updated"] = now
+
+		pause = max(INTERVAL, COST_FACTOR * _state.get("cost", 0.0))
+		if _state.get("dirty") and now - _state["updated"] >= pause:
+			_state["dirty"] = False
+			mirrorChanges(obj, group)
+			_state["cost"] = time.perf_counter() - now
+	finally:
+		_busy = False
+
+
+@persistent
+def clearLiveMirror(dummy):
+	"""
+	Handler for `load_post`. The symmetry map of the old file's mesh is meaningless in the new one.
+	"""
+	_state.clear()
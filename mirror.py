@@ -0,0 +1,795 @@
+import re
+import bisect
+import math
+import array
+import hashlib
+import itertools
+from collections import OrderedDict, deque
+
+from . import kernels
+from .pool import chunkedMap
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+# memory the cached symmetry maps may take, in bytes
+PAIR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# memory the search structures of a chunk of `chunkedPairs` may take by default, in bytes
+CHUNK_MEMORY_LIMIT = 512 * 1024 * 1024
+
+# estimated memory a vertex takes in the pure python search structures, in bytes
+VERTEX_BYTES = 320
+
+# chunks smaller than that make the halos around the cuts too expensive
+MIN_CHUNK_VERTICES = 4096
+
+# vertices handled between the checkpoints of the `*Steps` generators, see `runSteps`
+STEP_SIZE = 4096
+
+# vector-grouper leaves groups with more candidates than that to the next pass
+MAX_GROUP_CANDIDATES = 16
+
+SIDE_NAME_PATTERNS = (
+	# suffixes and prefixes like "arm.L", "arm_r", "L_arm"
+	(re.compile(r"([._\- ])([LlRr])$"), lambda m: m.group(1) + _SIDE_SWAP[m.group(2)]),
+	(re.compile(r"^([LlRr])([._\- ])"), lambda m: _SIDE_SWAP[m.group(1)] + m.group(2)),
+	# infixes like "thigh_L_twist", "arm.L.fk"
+	(re.compile(r"([._\- ])([LlRr])([._\- ])"), lambda m: m.group(1) + _SIDE_SWAP[m.group(2)] + m.group(3)),
+	# whole words like "armLeft", "Right_hand"
+	(re.compile(r"(Left|Right|(?<![A-Za-z])(?:left|right|LEFT|RIGHT))(?![a-z])"), lambda m: _SIDE_SWAP[m.group(1)]),
+)
+_SIDE_SWAP = {"L": "R", "R": "L", "l": "r", "r": "l",
+			  "Left": "Right", "Right": "Left", "left": "right", "right": "left", "LEFT": "RIGHT", "RIGHT": "LEFT"}
+
+# number Blender appends to duplicated names, e.g. ".001" in "hand.R.001"
+NAME_NUMBER_PATTERN = re.compile(r"^(.*?)(\.\d+)$")
+
+# anything that looks like a side, even if `mirroredGroupName` can't flip it
+SIDE_TOKEN_PATTERN = re.compile(r"(?:^|[._\- ])[LlRr](?:$|[._\- ])|(?<![a-z])(?:left|right)(?![a-z])", re.IGNORECASE)
+
+
+def mirroredGroupName(name):
+	"""
+	Returns the name of the vertex group on the other side, e.g. "hand.R" for "hand.L".
+	Like Blender's flip-side-name, a trailing number is kept: "hand.L.001" gives "hand.R.001".
+	:return: mirrored name, or None if the name has no side in it
+	"""
+	match = NAME_NUMBER_PATTERN.match(name)
+	base, number = match.groups() if match else (name, "")
+	for pattern, replacement in SIDE_NAME_PATTERNS:
+		result, count = pattern.subn(replacement, base, count=1)
+		if count:
+			return result + number
+	return None
+
+
+def hasSideToken(name):
+	"""
+	Checks whether the name looks like it belongs to one side, e.g. "hand.L" or "L_hand".
+	"""
+	return SIDE_TOKEN_PATTERN.search(name) is not None
+
+
+def isSymmetrical(a, b, axis_index, margin):
+	"""
+	Checks whether the vertices are symmetrical along given axis or not.
+	"""
+	for ax in range(3):
+		if ax == axis_index:
+			if not abs(a[ax] + b[ax]) < margin:
+				return False
+		elif not abs(a[ax] - b[ax]) < margin:
+			return False
+	return True
+
+
+def runSteps(steps):
+	"""
+	Runs a generator made by one of the `*Steps` functions to the end. Those are the `*Pairs` functions
+	split at checkpoints, so long searches can be interleaved with other work: they yield their progress
+	(0..1) every `STEP_SIZE` vertices or so, and return the same result as the respective `*Pairs` function.
+	:return: the result of `steps`
+	"""
+	while True:
+		try:
+			next(steps)
+		except StopIteration as stop:
+			return stop.value
+
+
+def _scaledSteps(steps, start, share):
+	"""
+	Passes the checkpoints of `steps` on, mapping its progress into `start`..`start` + `share`.
+	:return: the result of `steps`
+	"""
+	while True:
+		try:
+			progress = next(steps)
+		except StopIteration as stop:
+			return stop.value
+		yield start + progress * share
+
+
+def pereborPairs(coords, axis_index, margin, negative=False):
+	"""
+	Finds symmetrical vertices by brute force: every vertex is compared with all the pending vertices
+	of the other side. O(n^2), but doesn't depend on anything but `margin`.
+	Parameters and return value are the same as in `spatialHashPairs`.
+	"""
+	return runSteps(pereborSteps(coords, axis_index, margin, negative))
+
+
+def pereborSteps(coords, axis_index, margin, negative=False):
+	"""
+	`pereborPairs` split into steps, see `runSteps`.
+	"""
+	count = len(coords)
+	pending_sources = []
+	pending_targets = []
+	sources = []
+	targets = []
+
+	for index, co in enumerate(coords):
+		if not index % STEP_SIZE:
+			yield index / count
+		axis_coord = co[axis_index]
+		if (axis_coord < 0) if negative else (axis_coord > 0):
+			# weights are copied FROM these
+			# look for symmetrical vertex among saved ones
+			for n, other_index in enumerate(pending_targets):
+				if isSymmetrical(coords[other_index], co, axis_index, margin):
+					sources.append(index)
+					targets.append(other_index)
+					pending_targets.pop(n)
+					break
+			else:
+				pending_sources.append(index)
+		elif (axis_coord > 0) if negative else (axis_coord < 0):
+			# weights are copied TO these
+			for n, other_index in enumerate(pending_sources):
+				if isSymmetrical(coords[other_index], co, axis_index, margin):
+					sources.append(other_index)
+					targets.append(index)
+					pending_sources.pop(n)
+					break
+			else:
+				pending_targets.append(index)
+
+	return sources, targets, pending_sources, pending_targets
+
+
+def vectorGrouperPairs(coords, axis_index, margin, negative=False, resolution=2**14, max_passes=16, stats=None):
+	"""
+	Finds symmetrical vertices by grouping them by the squared distance to a pivot lying on the plane of symmetry.
+	Symmetrical vertices are equally distant from such a pivot, so every target vertex is compared only with
+	the source vertices of its own and the adjacent groups (a pair may be split by the rounding boundary).
+	The vertices left unpaired are regrouped relative to a pivot taken from themselves, and only they are
+	regrouped. Groups too crowded to be searched are left for the next pass. After `max_passes` passes
+	the rest is paired by `spatialHashPairs`, so the search never stalls.
+	:param resolution: the squared distances are multiplied by it and rounded to get the group key
+	:param max_passes: amount of regrouping passes before the fallback
+	:param stats: if a dict is given, it is filled with "remaining" (unpaired vertices after every pass)
+	and "fallback_pairs" (pairs found by the fallback)
+	Other parameters and return value are the same as in `spatialHashPairs`.
+	"""
+	return runSteps(vectorGrouperSteps(coords, axis_index, margin, negative, resolution, max_passes, stats))
+
+
+def vectorGrouperSteps(coords, axis_index, margin, negative=False, resolution=2**14, max_passes=16, stats=None, vectors=None):
+	"""
+	`vectorGrouperPairs` split into steps, see `runSteps`.
+	:param vectors: the coordinates as an array (see `kernels`) if the caller has them, made from `coords` otherwise
+	"""
+	if stats is None:
+		stats = dict()
+	stats["remaining"] = []
+	stats["fallback_pairs"] = 0
+
+	# vertices on the plane of symmetry have no pair
+	residual = [i for i, co in enumerate(coords) if abs(co[axis_index]) >= margin]
+	is_source = [(co[axis_index] < 0) == negative for co in coords]
+	sources = []
+	targets = []
+
+	if not residual:
+		return sources, targets, [], []
+
+	axes = tuple(i for i in range(3) if i != axis_index)
+	initial = len(residual)
+	if vectors is None:
+		vectors = kernels.fromList(coords)
+
+	for pass_index in range(max_passes):
+		# a pivot far from the mesh spreads the distances best. Later passes take one of the unpaired vertices.
+		if pass_index == 0:
+			pivot = [0.0, 0.0, 0.0]
+			for ax in axes:
+				pivot[ax] = max(coords[i][ax] for i in residual)
+		else:
+			pivot = list(coords[residual[(pass_index * 7919) % len(residual)]])
+			pivot[axis_index] = 0.0
+
+		distances = kernels.squaredDistances(kernels.take(vectors, residual), pivot).tolist()
+		keys = dict()
+		groups = dict()
+		for i, distance in zip(residual, distances):
+			key = round(distance * resolution)
+			keys[i] = key
+			if is_source[i]:
+				groups.setdefault(key, []).append(i)
+
+		paired = set()
+		for n, i in enumerate(residual):
+			if not n % STEP_SIZE:
+				yield min(2 * len(sources) / initial, 1.0)
+			if is_source[i]:
+				continue
+			key = keys[i]
+			candidates = [s for k in (key - 1, key, key + 1) for s in groups.get(k, ()) if s not in paired]
+			if len(candidates) > MAX_GROUP_CANDIDATES:
+				# crowded, another pivot will split them
+				continue
+
+			co = coords[i]
+			best = None
+			best_distance = float("inf")
+			for s in candidates:
+				other_co = coords[s]
+				if isSymmetrical(other_co, co, axis_index, margin):
+					distance = sum((abs(other_co[ax]) - abs(co[ax]))**2 for ax in range(3))
+					if distance < best_distance:
+						best_distance = distance
+						best = s
+			if best is not None:
+				sources.append(best)
+				targets.append(i)
+				paired.add(best)
+				paired.add(i)
+
+		residual = [i for i in residual if i not in paired]
+		stats["remaining"].append(len(residual))
+		if not residual:
+			break
+
+	# whatever is left gets the exhaustive treatment
+	done = min(2 * len(sources) / initial, 1.0)
+	res_sources, res_targets, unmatched_sources, unmatched_targets = yield from _scaledSteps(
+		spatialHashSteps([coords[i] for i in residual], axis_index, margin, negative), done, 1.0 - done)
+	sources.extend(residual[i] for i in res_sources)
+	targets.extend(residual[i] for i in res_targets)
+	stats["fallback_pairs"] = len(res_sources)
+
+	return sources, targets, [residual[i] for i in unmatched_sources], [residual[i] for i in unmatched_targets]
+
+
+def spatialHashPairs(coords, axis_index, margin, negative=False):
+	"""
+	Finds symmetrical vertices by bucketing the mirrored coordinates of the source side into a grid
+	with cells a few `margin`s wide. Every vertex of the target side checks only the neighbouring cells,
+	so the whole mesh is paired in about O(n).
+	:param coords: sequence of (x,y,z) coordinates, indexed by vertex index
+	:param axis_index: index of the axis of symmetry
+	:param margin: vertices are symmetrical if their coordinates differ less than `margin` on every axis
+	:param negative: if True, weights are copied from the negative side to the positive one. Otherwise from positive to negative.
+	:return: tuple (sources, targets, unmatched_sources, unmatched_targets). `sources[i]` is symmetrical to `targets[i]`.
+	Vertices lying on the plane of symmetry are not included anywhere.
+	"""
+	return runSteps(spatialHashSteps(coords, axis_index, margin, negative))
+
+
+def spatialHashSteps(coords, axis_index, margin, negative=False):
+	"""
+	`spatialHashPairs` split into steps, see `runSteps`.
+	"""
+	count = len(coords)
+	cell_size = _cellSize(margin)
+	grid = dict()
+	target_items = []
+
+	for index, co in enumerate(coords):
+		if not index % STEP_SIZE:
+			# filling the grid is a small part of the work
+			yield 0.2 * index / count
+		axis_coord = co[axis_index]
+		if abs(axis_coord) < margin:
+			# a vert in 0
+			continue
+		if (axis_coord < 0) == negative:
+			# weights are copied FROM these
+			_hashSource(grid, index, co, axis_index, cell_size)
+		else:
+			# weights are copied TO these
+			target_items.append((index, co))
+
+	sources, targets, unmatched_targets = yield from _scaledSteps(_matchTargetsSteps(grid, target_items, margin, cell_size), 0.2, 0.8)
+	unmatched_sources = sorted(i for bucket in grid.values() for i, _ in bucket)
+
+	return sources, targets, unmatched_sources, unmatched_targets
+
+
+def _cellSize(margin):
+	# a cell a few margins wide makes the margin box of a vertex overlap a single cell on most axes
+	return max(margin, 1e-9) * 4
+
+
+def _hashSource(grid, index, co, axis_index, cell_size):
+	"""
+	Puts a source vertex into the grid. It is stored mirrored, so it can be compared with targets directly.
+	"""
+	mirrored = list(co)
+	mirrored[axis_index] = -mirrored[axis_index]
+	key = tuple(math.floor(c / cell_size) for c in mirrored)
+	grid.setdefault(key, []).append((index, mirrored))
+
+
+def _matchTargetsSteps(grid, target_items, margin, cell_size):
+	"""
+	Pairs every target with the closest source left in the grid, in the order of `target_items`.
+	Paired sources are removed from the grid. Split into steps, see `runSteps`.
+	:param target_items: sequence of (vertex index, (x,y,z))
+	:return: tuple (sources, targets, unmatched_targets)
+	"""
+	count = len(target_items)
+	sources = []
+	targets = []
+	unmatched_targets = []
+
+	for n, (index, co) in enumerate(target_items):
+		if not n % STEP_SIZE:
+			yield n / count
+		# cells overlapped by the box of 2*margin around the vertex
+		ranges = [range(math.floor((c - margin) / cell_size), math.floor((c + margin) / cell_size) + 1) for c in co]
+		best = None
+		best_distance = float("inf")
+		for key in itertools.product(*ranges):
+			bucket = grid.get(key)
+			if not bucket:
+				continue
+			for n, (other_index, other_co) in enumerate(bucket):
+				dx = abs(other_co[0] - co[0])
+				dy = abs(other_co[1] - co[1])
+				dz = abs(other_co[2] - co[2])
+				if dx < margin and dy < margin and dz < margin:
+					distance = dx*dx + dy*dy + dz*dz
+					if distance < best_distance:
+						best_distance = distance
+						best = (bucket, n, other_index)
+
+		if best:
+			bucket, n, other_index = best
+			bucket.pop(n)
+			sources.append(other_index)
+			targets.append(index)
+		else:
+			unmatched_targets.append(index)
+
+	return sources, targets, unmatched_targets
+
+
+def chunkedPairs(coords, axis_index, margin, negative=False, memory_limit=CHUNK_MEMORY_LIMIT, stats=None):
+	"""
+	Finds the same pairs as `spatialHashPairs`, but never builds python structures for the whole mesh.
+	Vertices of both sides are sorted by the distance from the plane of symmetry and searched in chunks
+	of that order, so symmetrical vertices land in the same chunk. Sources a little beyond the chunk
+	are searched too, and the ones left unpaired close to the cut are carried to the next chunk.
+	Chunks are cut at the largest gap near the limit. The result may differ from `spatialHashPairs`
+	only when several vertices within `margin` of each other straddle a cut.
+	:param coords: array of vectors, see `kernels`
+	:param memory_limit: memory the search structures of one chunk may take, in bytes
+	:param stats: if a dict is given, it is filled with "chunks" (amount of chunks) and "peak_bytes"
+	(estimated peak memory of the search, including the arrays)
+	Other parameters are the same as in `spatialHashPairs`.
+	:return: the same as `spatialHashPairs`, but as `array.array("l")`
+	"""
+	return runSteps(chunkedSteps(coords, axis_index, margin, negative, memory_limit, stats))
+
+
+def chunkedSteps(coords, axis_index, margin, negative=False, memory_limit=CHUNK_MEMORY_LIMIT, stats=None):
+	"""
+	`chunkedPairs` split into steps, see `runSteps`.
+	"""
+	if stats is None:
+		stats = dict()
+
+	count = kernels.count(coords)
+	cell_size = _cellSize(margin)
+	chunk_size = max(memory_limit // VERTEX_BYTES, MIN_CHUNK_VERTICES)
+	sources, targets, unmatched_sources, unmatched_targets = (array.array("l") for i in range(4))
+
+	# both sides sorted together, a pair is within `margin` of each other in this order
+	if np is not None:
+		distances = np.abs(kernels.column(coords, axis_index))
+		order = np.argsort(distances, kind="mergesort")
+		distances = distances[order]
+		base_bytes = coords.nbytes + distances.nbytes + order.nbytes
+	else:
+		distances = [abs(c) for c in kernels.column(coords, axis_index)]
+		order = sorted(range(count), key=distances.__getitem__)
+		distances = [distances[i] for i in order]
+		base_bytes = len(coords) * coords.itemsize + (len(distances) + len(order)) * VERTEX_BYTES // 8
+
+	# unpaired sources of the previous chunk close to the cut
+	pending = []
+	# sources of this chunk already paired by the previous one
+	taken = set()
+	peak_bytes = 0
+	chunks = 0
+	low = 0
+
+	while low < count:
+		high = _cutPosition(distances, low, chunk_size)
+		# float32 distances are a bit off, so the margins around the cut are doubled. The bound is a python float:
+		# float32 can't tell a few margins apart far from the origin. The chunk always holds its own vertices.
+		halo_high = max(high, _searchSorted(distances, float(distances[high - 1]) + 2 * margin, right=True))
+		chunk_indices = order[low:halo_high]
+		chunk_coords = kernels.toList(kernels.take(coords, chunk_indices))
+
+		grid = dict()
+		for index, mirrored in pending:
+			key = tuple(math.floor(c / cell_size) for c in mirrored)
+			grid.setdefault(key, []).append((index, mirrored))
+		halo = set()
+		target_items = []
+		for position, (index, co) in enumerate(zip(chunk_indices, chunk_coords)):
+			axis_coord = co[axis_index]
+			if abs(axis_coord) < margin:
+				continue
+			if (axis_coord < 0) == negative:
+				if index in taken:
+					continue
+				_hashSource(grid, int(index), co, axis_index, cell_size)
+				if position >= high - low:
+					halo.add(int(index))
+			elif position < high - low:
+				target_items.append((int(index), co))
+		# targets go in the index order, like in `spatialHashPairs`
+		target_items.sort(key=lambda item: item[0])
+
+		chunk_bytes = (len(chunk_coords) + len(pending)) * VERTEX_BYTES
+		del chunk_coords
+
+		chunk_sources, chunk_targets, chunk_unmatched = yield from _scaledSteps(
+			_matchTargetsSteps(grid, target_items, margin, cell_size), low / count, (high - low) / count)
+		sources.extend(chunk_sources)
+		targets.extend(chunk_targets)
+		unmatched_targets.extend(chunk_unmatched)
+
+		# sources beyond the cut are loaded again by the next chunk, unless they are already paired
+		taken = halo.intersection(chunk_sources)
+		next_distance = float(distances[high]) if high < count else float("inf")
+		pending = []
+		for bucket in grid.values():
+			for index, mirrored in bucket:
+				if index in halo:
+					continue
+				if abs(mirrored[axis_index]) >= next_distance - 2 * margin:
+					pending.append((index, mirrored))
+				else:
+					unmatched_sources.append(index)
+
+		result_bytes = sum(len(i) * i.itemsize for i in (sources, targets, unmatched_sources, unmatched_targets))
+		peak_bytes = max(peak_bytes, base_bytes + chunk_bytes + result_bytes)
+		chunks += 1
+		low = high
+
+	stats["chunks"] = chunks
+	stats["peak_bytes"] = peak_bytes
+
+	return sources, targets, array.array("l", sorted(unmatched_sources)), unmatched_targets
+
+
+def _cutPosition(distances, low, size):
+	"""
+	Returns the end of the chunk starting at `low`: the largest gap between the distances
+	in the last eighth of the chunk, so few vertices have their pair across the cut.
+	"""
+	count = len(distances)
+	high = low + size
+	if high >= count:
+		return count
+	window = max(high - size // 8, low + 1)
+	if np is not None:
+		gaps = np.diff(distances[window - 1:high])
+		return window + int(np.argmax(gaps))
+	return max(range(window, high), key=lambda i: distances[i] - distances[i - 1])
+
+
+def _searchSorted(distances, value, right=False):
+	"""
+	Returns the position of the first distance not less than `value`, or greater than it if `right`.
+	"""
+	if np is not None:
+		return int(np.searchsorted(distances, value, side="right" if right else "left"))
+	return bisect.bisect_right(distances, value) if right else bisect.bisect_left(distances, value)
+
+
+def edgeAdjacency(edges, count):
+	"""
+	Builds the adjacency of the vertices in compressed form: neighbours of vertex i are
+	`neighbours[offsets[i]:offsets[i + 1]]`.
+	:param edges: vertex indices of the edges, as returned by `kernels.readIndices(mesh.edges, "vertices", 2)`
+	:param count: amount of vertices
+	:return: tuple (offsets, neighbours) as lists
+	"""
+	if np is not None:
+		edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+		heads = np.concatenate((edges[:, 0], edges[:, 1]))
+		tails = np.concatenate((edges[:, 1], edges[:, 0]))
+		offsets = np.zeros(count + 1, dtype=np.int64)
+		offsets[1:] = np.cumsum(np.bincount(heads, minlength=count))
+		return offsets.tolist(), tails[np.argsort(heads, kind="mergesort")].tolist()
+
+	edges = list(edges)
+	heads = edges[0::2] + edges[1::2]
+	tails = edges[1::2] + edges[0::2]
+	offsets = [0] * (count + 1)
+	for head in heads:
+		offsets[head + 1] += 1
+	for i in range(count):
+		offsets[i + 1] += offsets[i]
+	neighbours = [0] * len(heads)
+	position = offsets[:-1]
+	for head, tail in zip(heads, tails):
+		neighbours[position[head]] = tail
+		position[head] += 1
+	return offsets, neighbours
+
+
+def topologyPairs(coords, edges, axis_index, margin, negative=False, stats=None):
+	"""
+	Finds symmetrical vertices by walking the edges breadth-first from the seam (vertices lying on
+	the plane of symmetry), on both sides at once. Unpaired neighbours of two symmetrical vertices
+	are symmetrical too: a single neighbour on each side gives a pair, several ones are told apart
+	by the amount of their edges, and only if that is ambiguous too, by the mirrored coordinates.
+	So the halves may differ much more than `margin`, as long as their topology is the same.
+	Parts not connected to the seam are anchored by `spatialHashPairs` and walked from there.
+	O(V+E), apart from the anchoring.
+	:param edges: vertex indices of the edges, see `edgeAdjacency`
+	:param margin: vertices closer than that to the plane of symmetry make the seam
+	:param stats: if a dict is given, it is filled with "topology_pairs" (pairs told apart by topology alone),
+	"coordinate_pairs" (ambiguous ones told apart by coordinates) and "anchor_pairs" (found by the anchoring)
+	Other parameters and return value are the same as in `spatialHashPairs`.
+	"""
+	return runSteps(topologySteps(coords, edges, axis_index, margin, negative, stats))
+
+
+def topologySteps(coords, edges, axis_index, margin, negative=False, stats=None):
+	"""
+	`topologyPairs` split into steps, see `runSteps`.
+	"""
+	if stats is None:
+		stats = dict()
+	stats["topology_pairs"] = 0
+	stats["coordinate_pairs"] = 0
+	stats["anchor_pairs"] = 0
+
+	count = len(coords)
+	offsets, neighbours = edgeAdjacency(edges, count)
+
+	# 0 for the seam, 1 for the side weights are copied FROM, -1 for the side they are copied TO
+	sides = [0 if abs(co[axis_index]) < margin else (1 if (co[axis_index] < 0) == negative else -1) for co in coords]
+	mapped = bytearray(count)
+	queue = deque()
+	for index, side in enumerate(sides):
+		if side == 0:
+			mapped[index] = 1
+			queue.append((index, index))
+
+	sources = []
+	targets = []
+
+	def pair(source, target):
+		sources.append(source)
+		targets.append(target)
+		mapped[source] = 1
+		mapped[target] = 1
+		queue.append((source, target))
+
+	def match(source_candidates, target_candidates):
+		"""
+		Pairs the unpaired neighbours of two symmetrical vertices.
+		"""
+		if not source_candidates or not target_candidates:
+			return
+		if len(source_candidates) == 1 and len(target_candidates) == 1:
+			stats["topology_pairs"] += 1
+			pair(source_candidates[0], target_candidates[0])
+			return
+
+		# a degree met once on each side gives a pair
+		source_degrees = dict()
+		target_degrees = dict()
+		for candidates, degrees in ((source_candidates, source_degrees), (target_candidates, target_degrees)):
+			for i in candidates:
+				degrees.setdefault(offsets[i + 1] - offsets[i], []).append(i)
+		rest_sources = []
+		rest_targets = []
+		for degree, group in source_degrees.items():
+			other_group = target_degrees.get(degree, ())
+			if len(group) == 1 and len(other_group) == 1:
+				stats["topology_pairs"] += 1
+				pair(group[0], other_group[0])
+			else:
+				rest_sources.extend(group)
+				rest_targets.extend(other_group)
+
+		# ambiguous: the closest mirrored coordinates first
+		options = []
+		for s in rest_sources:
+			a = coords[s]
+			for t in rest_targets:
+				b = coords[t]
+				options.append((sum((b[ax] - (-a[ax] if ax == axis_index else a[ax]))**2 for ax in range(3)), s, t))
+		options.sort()
+		for distance, s, t in options:
+			if not mapped[s] and not mapped[t]:
+				stats["coordinate_pairs"] += 1
+				pair(s, t)
+
+	def walk():
+		n = 0
+		while queue:
+			n += 1
+			if not n % STEP_SIZE:
+				yield min(2 * len(sources) / count, 1.0)
+			a, b = queue.popleft()
+			a_neighbours = neighbours[offsets[a]:offsets[a + 1]]
+			b_neighbours = a_neighbours if a == b else neighbours[offsets[b]:offsets[b + 1]]
+			# neighbours of the source vertex on its own side are symmetrical to those of the target one on the other side.
+			# Edges may cross the plane too, then it's the other way around.
+			match([n for n in a_neighbours if not mapped[n] and sides[n] == 1], [n for n in b_neighbours if not mapped[n] and sides[n] == -1])
+			if a != b:
+				match([n for n in b_neighbours if not mapped[n] and sides[n] == 1], [n for n in a_neighbours if not mapped[n] and sides[n] == -1])
+
+	yield from walk()
+
+	# parts not connected to the seam
+	residual = [i for i in range(count) if not mapped[i]]
+	if residual:
+		done = min(2 * len(sources) / count, 1.0)
+		res_sources, res_targets, unmatched_sources, unmatched_targets = yield from _scaledSteps(
+			spatialHashSteps([coords[i] for i in residual], axis_index, margin, negative), done, 1.0 - done)
+		stats["anchor_pairs"] = len(res_sources)
+		for s, t in zip(res_sources, res_targets):
+			pair(residual[s], residual[t])
+		yield from walk()
+
+	unmatched_sources = [i for i in range(count) if not mapped[i] and sides[i] == 1]
+	unmatched_targets = [i for i in range(count) if not mapped[i] and sides[i] == -1]
+
+	return sources, targets, unmatched_sources, unmatched_targets
+
+
+def quantizedPairs(coords, axis_index, margin, negative=False):
+	"""
+	Finds symmetrical vertices with vectorized operations. The mirrored source coordinates and the target
+	coordinates are quantized to a grid and sorted together, so a grid cell holding exactly one vertex
+	of each side gives a pair. Vertices left over (e.g. split by a cell boundary) are paired by `spatialHashPairs`.
+	Requires numpy.
+	:param coords: float array of shape (N, 3)
+	Other parameters and return value are the same as in `spatialHashPairs`.
+	"""
+	coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+	axis_coords = coords[:, axis_index]
+	off_plane = np.abs(axis_coords) >= margin
+	is_source = off_plane & ((axis_coords < 0) == negative)
+	is_target = off_plane & ~is_source
+
+	source_indices = np.flatnonzero(is_source)
+	target_indices = np.flatnonzero(is_target)
+	mirrored = kernels.mirrored(coords[source_indices], axis_index)
+
+	indices = np.concatenate((source_indices, target_indices))
+	points = np.concatenate((mirrored, coords[target_indices]))
+	sides = np.concatenate((np.zeros(len(source_indices), dtype=np.int8), np.ones(len(target_indices), dtype=np.int8)))
+	cell_size = max(margin, 1e-9) * 2
+	keys = chunkedMap(lambda chunk: np.floor(chunk / cell_size).astype(np.int64), points)
+
+	# sources come first within a cell
+	order = np.lexsort((sides, keys[:, 2], keys[:, 1], keys[:, 0]))
+	keys = keys[order]
+	sides = sides[order]
+
+	# a cell starts where the key differs from the previous one
+	starts = np.ones(len(order), dtype=bool)
+	starts[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+	start_positions = np.flatnonzero(starts)
+	lengths = np.diff(np.append(start_positions, len(order)))
+
+	# cells with exactly one source followed by one target
+	pair_starts = start_positions[lengths == 2]
+	pair_starts = pair_starts[(sides[pair_starts] == 0) & (sides[pair_starts + 1] == 1)]
+	first = order[pair_starts]
+	second = order[pair_starts + 1]
+	close = np.all(np.abs(points[first] - points[second]) < margin, axis=1)
+
+	sources = indices[first[close]]
+	targets = indices[second[close]]
+
+	paired = np.zeros(len(coords), dtype=bool)
+	paired[sources] = True
+	paired[targets] = True
+	residual = np.flatnonzero(off_plane & ~paired)
+
+	res_sources, res_targets, unmatched_sources, unmatched_targets = spatialHashPairs(coords[residual].tolist(), axis_index, margin, negative)
+
+	sources = sources.tolist() + residual[res_sources].tolist()
+	targets = targets.tolist() + residual[res_targets].tolist()
+
+	return sources, targets, residual[unmatched_sources].tolist(), residual[unmatched_targets].tolist()
+
+
+def geometryHash(coords, edge_count=0, face_count=0, edges=None):
+	"""
+	Returns a cheap hash of the vertex coordinates and the amount of elements in the mesh.
+	:param coords: array of vectors, see `kernels`
+	:param edges: if given, the edges are hashed too, for the results that depend on topology
+	"""
+	result = hashlib.sha1(kernels.toBytes(coords))
+	if edges is not None:
+		result.update(edges.tobytes())
+	result.update("{0} {1} {2}".format(kernels.count(coords), edge_count, face_count).encode())
+	return result.hexdigest()
+
+
+def pairMapBytes(result):
+	"""
+	Returns the memory a symmetry map (the result of a `*Pairs` function) takes as arrays of indices, in bytes.
+	"""
+	return sum(len(i) for i in result) * array.array("l").itemsize
+
+
+class PairMapCache(object):
+	"""
+	Keeps the computed symmetry maps (the results of the `*Pairs` functions), so mirroring again on
+	an unchanged mesh doesn't redo the search. Least recently used maps are evicted when the total
+	size exceeds `max_bytes`.
+	Keys are tuples starting with (mesh name, geometry hash), the rest describes the search settings.
+	"""
+	def __init__(self, max_bytes=PAIR_CACHE_MAX_BYTES):
+		self.max_bytes = max_bytes
+		self.entries = OrderedDict()
+		self.total_bytes = 0
+
+	def get(self, key):
+		"""
+		:return: tuple (sources, targets, unmatched_sources, unmatched_targets) as lists, or None if not cached
+		"""
+		if key not in self.entries:
+			return None
+		self.entries.move_to_end(key)
+		return tuple(i.tolist() for i in self.entries[key])
+
+	def put(self, key, result):
+		# the maps of the older geometry of this mesh will never be used again
+		mesh_name, geometry_hash = key[:2]
+		for old_key in [k for k in self.entries if k[0] == mesh_name and k[1] != geometry_hash]:
+			self.remove(old_key)
+
+		size = pairMapBytes(result)
+		if size > self.max_bytes:
+			return
+		value = tuple(array.array("l", i) for i in result)
+
+		if key in self.entries:
+			self.remove(key)
+		self.entries[key] = value
+		self.total_bytes += size
+
+		while self.total_bytes > self.max_bytes:
+			self.remove(next(iter(self.entries)))
+
+	def remove(self, key):
+		value = self.entries.pop(key)
+		self.total_bytes -= pairMapBytes(value)
+
+	def clear(self):
+		self.entries.clear()
+		self.total_bytes = 0
+
+
+pair_cache = PairMapCache()
@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+# chunks smaller than that are not worth a thread
+MIN_CHUNK_SIZE = 65536
+
+_executor = None
+_executor_size = 0
+
+
+def getProcessCount():
+	"""
+	Returns the amount of workers set in the scene's "Processes" property.
+	Outside of a scene (e.g. in background scripts) the number of CPU cores is used.
+	"""
+	import bpy
+	try:
+		return max(bpy.context.scene.omnitools_processes, 1)
+	except AttributeError:
+		return os.cpu_count() or 1
+
+
+def getPool():
+	"""
+	Returns the shared thread pool. It is created on first use and recreated when the "Processes"
+	property changes. NumPy, zlib and subprocess waits release the GIL, so threads do use several cores.
+	"""
+	global _executor, _executor_size
+	size = getProcessCount()
+	if _executor is None or _executor_size != size:
+		shutdown()
+		_executor = ThreadPoolExecutor(max_workers=size)
+		_executor_size = size
+	return _executor
+
+
+def chunkedMap(func, array):
+	"""
+	Splits the array along the first axis, runs `func` on the chunks in the shared pool
+	and concatenates the results. Small arrays are processed in the calling thread.
+	:param func: takes an array, returns an array with the same length along the first axis
+	"""
+	workers = min(getProcessCount(), len(array) // MIN_CHUNK_SIZE)
+	if np is None or workers < 2:
+		return func(array)
+	return np.concatenate(list(getPool().map(func, np.array_split(array, workers))))
+
+
+def shutdown():
+	"""
+	Stops the shared pool, waiting for the running tasks. Called on add-on unregistration.
+	"""
+	global _executor, _executor_size
+	if _executor is not None:
+		_executor.shutdown(wait=True)
+	_executor = None
+	_executor_size = 0
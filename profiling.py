@@ -0,0 +1,83 @@
+import json
+import time
+import functools
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+# amount of operator runs kept in the history
+HISTORY_LENGTH = 200
+
+history = deque(maxlen=HISTORY_LENGTH)
+
+# record of the operator being executed now
+_current = None
+
+
+@contextmanager
+def phase(name):
+	"""
+	Measures a phase of the running operator:
+		with phase("matching"):
+			...
+	Outside of a profiled execute does nothing.
+	"""
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		if _current is not None:
+			phases = _current["phases"]
+			phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def profiled(execute):
+	"""
+	Wraps `execute` of an operator, so every run is recorded in `history` with its wall time,
+	the vertex and face counts of the active mesh and the phases measured with `phase`.
+	"""
+	@functools.wraps(execute)
+	def wrapper(self, context):
+		global _current
+		record = OrderedDict((("operator", self.bl_idname), ("time", time.time()), ("wall_time", 0.0),
+							  ("vertices", 0), ("faces", 0), ("phases", OrderedDict())))
+		obj = context.active_object
+		if obj and obj.type == 'MESH':
+			record["vertices"] = len(obj.data.vertices)
+			record["faces"] = len(obj.data.polygons)
+
+		outer = _current
+		_current = record
+		start = time.perf_counter()
+		try:
+			return execute(self, context)
+		finally:
+			record["wall_time"] = time.perf_counter() - start
+			_current = outer
+			history.append(record)
+	return wrapper
+
+
+def profileOperators(namespace):
+	"""
+	Wraps `execute` of every VIEW3D_OT_* operator class in the namespace (e.g. `globals()` of a module).
+	Classes with `omnitools_profile = False` are left alone.
+	"""
+	for name, cls in namespace.items():
+		if name.startswith("VIEW3D_OT_") and hasattr(cls, "execute") and getattr(cls, "omnitools_profile", True):
+			cls.execute = profiled(cls.execute)
+
+
+def formatRecord(record):
+	"""
+	Returns a one-line summary of a history record for the UI.
+	"""
+	result = "{0}: {1:.3f}s, {2}v/{3}f".format(record["operator"].split(".")[-1], record["wall_time"],
+											  record["vertices"], record["faces"])
+	if record["phases"]:
+		result += " (" + ", ".join("{0} {1:.3f}".format(k, v) for k, v in record["phases"].items()) + ")"
+	return result
+
+
+def dumpHistory(filepath):
+	with open(filepath, "w") as f:
+		json.dump(list(history), f, indent=1)
@@ -0,0 +1,218 @@
+"""
+Compact mesh backups. The first backup of a mesh is a full copy (the base), kept by a fake user.
+The following backups with the same topology store only the difference of vertex coordinates to the base,
+compressed, in an ID property of the mesh. A full copy is made again only when the topology changes.
+"""
+
+import time
+import zlib
+import array
+import base64
+import hashlib
+
+import bpy
+
+from . import kernels
+
+# ID property of the mesh that lists its snapshots
+REGISTRY_KEY = "omnitools_snapshots"
+
+# default memory the snapshots of one mesh may take, in bytes
+DEFAULT_BUDGET = 256 * 1024 * 1024
+
+
+def getRegistry(mesh):
+	"""
+	Returns {snapshot name: entry} of the mesh. An entry is a dict with "kind" ("full" or "delta"),
+	"time" and "size" in bytes. Full entries have "mesh" (name of the copy) and "topology" (hash),
+	delta entries have "base" (name of the full entry) and "data" (the compressed difference).
+	"""
+	prop = mesh.get(REGISTRY_KEY)
+	return prop.to_dict() if prop is not None else dict()
+
+
+def listSnapshots(mesh):
+	"""
+	Returns the snapshot names of the mesh, oldest first.
+	"""
+	registry = getRegistry(mesh)
+	return sorted(registry, key=lambda name: (registry[name]["time"], name))
+
+
+def topologyHash(mesh):
+	"""
+	Returns a hash of the mesh connectivity: edges and faces, but not coordinates.
+	"""
+	result = hashlib.sha1()
+	for collection, attribute, size in ((mesh.edges, "vertices", 2), (mesh.loops, "vertex_index", 1),
+										(mesh.polygons, "loop_start", 1)):
+		values = array.array("i", bytes(len(collection) * size * 4))
+		collection.foreach_get(attribute, values)
+		result.update(values.tobytes())
+	result.update("{0}".format(len(mesh.vertices)).encode())
+	return result.hexdigest()
+
+
+def meshSize(mesh):
+	"""
+	Estimates the memory a copy of the mesh takes, in bytes.
+	"""
+	return len(mesh.vertices) * 16 + len(mesh.edges) * 12 + len(mesh.loops) * 8 + len(mesh.polygons) * 12
+
+
+def _xor(a, b):
+	"""
+	XORs two byte strings of the same length as 32-bit words.
+	"""
+	np = kernels.np
+	if np is not None:
+		return (np.frombuffer(a, dtype=np.uint32) ^ np.frombuffer(b, dtype=np.uint32)).tobytes()
+	return array.array("I", (x ^ y for x, y in zip(array.array("I", a), array.array("I", b)))).tobytes()
+
+
+def encodeDelta(coords, base_coords):
+	"""
+	Encodes the difference of two coordinate arrays of the same length. The bit patterns are XORed,
+	so restoring is exact and unchanged vertices turn into zeros, which compress very well.
+	:return: string for an ID property
+	"""
+	delta = _xor(kernels.toBytes(coords), kernels.toBytes(base_coords))
+	return base64.b64encode(zlib.compress(delta, 6)).decode("ascii")
+
+
+def decodeDelta(data, base_coords):
+	"""
+	Restores the coordinates from `encodeDelta` result and the base coordinates.
+	:return: array of vectors, see `kernels`
+	"""
+	delta = zlib.decompress(base64.b64decode(data.encode("ascii")))
+	result = _xor(delta, kernels.toBytes(base_coords))
+	if kernels.np is not None:
+		return kernels.np.frombuffer(result, dtype=kernels.np.float32).reshape(-1, 3)
+	return array.array("f", result)
+
+
+def takeSnapshot(mesh, budget=DEFAULT_BUDGET):
+	"""
+	Backups the mesh. Must be called in OBJECT mode.
+	:param budget: memory all the snapshots of the mesh may take, in bytes. The oldest are removed if exceeded.
+	:return: name of the snapshot
+	"""
+	registry = getRegistry(mesh)
+	name = time.strftime("%Y-%m-%d %H:%M:%S")
+	n = 1
+	while name in registry:
+		n += 1
+		name = time.strftime("%Y-%m-%d %H:%M:%S") + " ({0})".format(n)
+
+	topology = topologyHash(mesh)
+	base_name = None
+	for other in reversed(listSnapshots(mesh)):
+		entry = registry[other]
+		if entry["kind"] == "full" and entry["topology"] == topology and entry["mesh"] in bpy.data.meshes:
+			base_name = other
+			break
+
+	if base_name:
+		base_mesh = bpy.data.meshes[registry[base_name]["mesh"]]
+		data = encodeDelta(kernels.readVectors(mesh.vertices), kernels.readVectors(base_mesh.vertices))
+		entry = {"kind": "delta", "base": base_name, "data": data, "size": len(data)}
+	else:
+		copy = mesh.copy()
+		copy.name = mesh.name + "_base"
+		copy.use_fake_user = True
+		# the copy gets the ID properties too
+		if REGISTRY_KEY in copy:
+			del copy[REGISTRY_KEY]
+		entry = {"kind": "full", "mesh": copy.name, "topology": topology, "size": meshSize(mesh)}
+	entry["time"] = time.time()
+
+	registry[name] = entry
+	mesh[REGISTRY_KEY] = registry
+	pruneSnapshots(mesh, budget=budget, protect=name)
+	return name
+
+
+def restoreSnapshot(obj, name):
+	"""
+	Restores the object's mesh from the snapshot. If the topology is the same, only coordinates are written.
+	Otherwise the object gets a copy of the snapshot's mesh, and the current one is renamed with "_old" postfix.
+	Must be called in OBJECT mode.
+	:return: False if the snapshot or the mesh copy it is based on is gone (e.g. renamed or purged), True otherwise
+	"""
+	mesh = obj.data
+	registry = getRegistry(mesh)
+	entry = registry.get(name)
+	if entry is None:
+		return False
+	full = entry if entry["kind"] == "full" else registry.get(entry["base"])
+	source = bpy.data.meshes.get(full["mesh"]) if full is not None else None
+	if source is None:
+		return False
+
+	coords = kernels.readVectors(source.vertices)
+	if entry["kind"] == "delta":
+		coords = decodeDelta(entry["data"], coords)
+
+	if topologyHash(mesh) != full["topology"]:
+		new_mesh = source.copy()
+		new_mesh.use_fake_user = False
+		new_mesh[REGISTRY_KEY] = registry
+		# the snapshots go with the object, two meshes must not share the copies they are based on
+		del mesh[REGISTRY_KEY]
+		mesh_name = mesh.name
+		mesh.name = mesh_name + "_old"
+		new_mesh.name = mesh_name
+		obj.data = new_mesh
+		mesh = new_mesh
+
+	kernels.writeVectors(mesh.vertices, coords)
+	mesh.update()
+	return True
+
+
+def removeSnapshot(mesh, name):
+	"""
+	Removes the snapshot and, if it was a full one, its mesh copy. Delta snapshots based on it are removed too.
+	"""
+	registry = getRegistry(mesh)
+	_remove(registry, name)
+	mesh[REGISTRY_KEY] = registry
+
+
+def pruneSnapshots(mesh, budget=None, keep=None, protect=None):
+	"""
+	Removes the oldest snapshots until they take no more than `budget` bytes and there are no more than `keep` of them.
+	A full snapshot is removed only when no delta snapshots depend on it.
+	:param protect: name of a snapshot that must stay
+	:return: amount of removed snapshots
+	"""
+	registry = getRegistry(mesh)
+	removed = 0
+
+	def exceeded():
+		return (budget is not None and sum(e["size"] for e in registry.values()) > budget) or \
+			   (keep is not None and len(registry) > keep)
+
+	while exceeded():
+		bases = set(e["base"] for e in registry.values() if e["kind"] == "delta")
+		candidates = sorted((e["time"], name) for name, e in registry.items() if name not in bases and name != protect)
+		if not candidates:
+			break
+		_remove(registry, candidates[0][1])
+		removed += 1
+
+	mesh[REGISTRY_KEY] = registry
+	return removed
+
+
+def _remove(registry, name):
+	entry = registry.pop(name)
+	if entry["kind"] == "full":
+		for other in [k for k, e in registry.items() if e.get("base") == name]:
+			registry.pop(other)
+		copy = bpy.data.meshes.get(entry["mesh"])
+		if copy is not None:
+			copy.use_fake_user = False
+			if not copy.users:
+				bpy.data.meshes.remove(copy)
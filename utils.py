@@ -1,6 +1,27 @@
+import os
+import json
 import bpy
+import bmesh
+from bpy.app.handlers import persistent
 from mathutils import Vector
 import math
+import random
+
+# numpy module, imported on first use so it doesn't slow down add-on loading. False means not tried yet.
+_numpy = False
+
+
+def getNumpy():
+	"""
+	Returns the numpy module, or None if it is not available.
+	"""
+	global _numpy
+	if _numpy is False:
+		try:
+			import numpy as _numpy
+		except ImportError:
+			_numpy = None
+	return _numpy
 
 
 def vectorMultiply(a,b):
@@ -36,6 +57,157 @@ def radiusVectorLength(vert, return_square=False):
 	return result
 
 
+def getVertexCoordinates(mesh):
+	"""
+	Reads the coordinates of all vertices of the mesh with a single `foreach_get` call.
+	:param mesh: mesh datablock
+	:return: array of vectors, see `kernels`
+	"""
+	from . import kernels
+	return kernels.readVectors(mesh.vertices)
+
+
+def offsetVertices(mesh, offset):
+	"""
+	Subtracts `offset` from the coordinates of all vertices of the mesh, with a single read and write.
+	Works in OBJECT mode only.
+	:param offset: (x,y,z)
+	"""
+	from . import kernels
+	kernels.writeVectors(mesh.vertices, kernels.shifted(getVertexCoordinates(mesh), offset))
+	mesh.update()
+
+
+def getMaterialFaces(mesh):
+	"""
+	Groups the faces of the mesh by material, reading all material indices with a single `foreach_get`.
+	Works in OBJECT mode only.
+	:return: dict {material index: list of face indices}. Materials without faces are not included.
+	"""
+	np = getNumpy()
+	count = len(mesh.polygons)
+
+	if np is not None:
+		material_indices = np.empty(count, dtype=np.int32)
+		mesh.polygons.foreach_get("material_index", material_indices)
+		order = np.argsort(material_indices, kind="mergesort")
+		materials, starts = np.unique(material_indices[order], return_index=True)
+		return dict(zip(materials.tolist(), (i.tolist() for i in np.split(order, starts[1:]))))
+
+	material_indices = [0] * count
+	mesh.polygons.foreach_get("material_index", material_indices)
+	result = dict()
+	for face_index, material_index in enumerate(material_indices):
+		result.setdefault(material_index, []).append(face_index)
+	return result
+
+
+def selectVerticesBeyond(mesh, axis_index, threshold, negative=False, extend=True):
+	"""
+	Selects the vertices with the coordinate on given axis greater (or less, if `negative`) than `threshold`.
+	Edges and faces get selected if all of their vertices are. Works in OBJECT mode only.
+	:param extend: if True, keeps the selection that was there before
+	"""
+	from . import kernels
+	np = getNumpy()
+	count = len(mesh.vertices)
+	mask = kernels.beyond(getVertexCoordinates(mesh), axis_index, threshold, negative)
+
+	if np is not None:
+		if extend:
+			selection = np.empty(count, dtype=bool)
+			mesh.vertices.foreach_get("select", selection)
+			mask |= selection
+		mesh.vertices.foreach_set("select", mask)
+
+		# flush the selection to edges and faces
+		edge_verts = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+		mesh.edges.foreach_get("vertices", edge_verts)
+		mesh.edges.foreach_set("select", mask[edge_verts].reshape(-1, 2).all(axis=1))
+
+		if len(mesh.polygons):
+			loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+			mesh.loops.foreach_get("vertex_index", loop_verts)
+			loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+			mesh.polygons.foreach_get("loop_start", loop_starts)
+			mesh.polygons.foreach_set("select", np.logical_and.reduceat(mask[loop_verts], loop_starts))
+		return
+
+	if extend:
+		selection = [False] * count
+		mesh.vertices.foreach_get("select", selection)
+		mask = [a or b for a, b in zip(mask, selection)]
+	mesh.vertices.foreach_set("select", mask)
+
+	edge_verts = [0] * (len(mesh.edges) * 2)
+	mesh.edges.foreach_get("vertices", edge_verts)
+	mesh.edges.foreach_set("select", [mask[a] and mask[b] for a, b in zip(edge_verts[0::2], edge_verts[1::2])])
+	for poly in mesh.polygons:
+		poly.select = all(mask[i] for i in poly.vertices)
+
+
+def addWeightsBatched(vertex_group, indices, weights):
+	"""
+	Sets the weights of given vertices, replacing the old ones. Vertices sharing the same weight
+	are written with a single `vertex_group.add` call.
+	:param indices: vertex indices
+	:param weights: weights for the respective vertices
+	"""
+	batches = dict()
+	for index, weight in zip(indices, weights):
+		batches.setdefault(weight, []).append(index)
+
+	for weight, batch in batches.items():
+		vertex_group.add(batch, weight, "REPLACE")
+
+
+def jitterTransforms(count, location, rotation, scale, offsets, max_offsets, max_rotations, scale_jitter, seed=0):
+	"""
+	Generates the transforms of a jittered array all at once.
+	Instance i is shifted by `offsets` * (i + 1), plus a random value in +-`max_offsets`.
+	Rotation and scale get a random value in +-`max_rotations` and +-`scale_jitter` respectively.
+	:param location, rotation, scale: transform of the original object
+	:param seed: the same seed gives the same array
+	:return: tuple (locations, rotations, scales), each a list of `count` [x,y,z] lists
+	"""
+	np = getNumpy()
+	if np is not None:
+		jitter = 2 * np.random.RandomState(seed).random_sample((count, 9)) - 1
+		steps = np.arange(1, count + 1).reshape(-1, 1)
+		locations = np.asarray(location) + steps * np.asarray(offsets) + jitter[:, 0:3] * np.asarray(max_offsets)
+		scales = np.asarray(scale) + jitter[:, 3:6] * np.asarray(scale_jitter)
+		rotations = np.asarray(rotation) + jitter[:, 6:9] * np.asarray(max_rotations)
+		return locations.tolist(), rotations.tolist(), scales.tolist()
+
+	rand = random.Random(seed)
+	locations = []
+	rotations = []
+	scales = []
+	for i in range(count):
+		jitter = [2 * rand.random() - 1 for j in range(9)]
+		locations.append([location[j] + offsets[j] * (i + 1) + jitter[j] * max_offsets[j] for j in range(3)])
+		scales.append([scale[j] + jitter[3 + j] * scale_jitter[j] for j in range(3)])
+		rotations.append([rotation[j] + jitter[6 + j] * max_rotations[j] for j in range(3)])
+	return locations, rotations, scales
+
+
+def loadManifest(directory, name):
+	"""
+	Loads a JSON manifest kept in the output directory by incremental tools (e.g. hashes of saved files).
+	:return: dict, empty if there is no manifest yet
+	"""
+	try:
+		with open(os.path.join(directory, name)) as f:
+			return json.load(f)
+	except (IOError, ValueError):
+		return dict()
+
+
+def saveManifest(directory, name, manifest):
+	with open(os.path.join(directory, name), "w") as f:
+		json.dump(manifest, f, indent=1, sort_keys=True)
+
+
 def getSelectedMeshObjects():
 	"""
 	Returns a list of selected mesh objects
@@ -43,19 +215,93 @@ def getSelectedMeshObjects():
 	return [i for i in bpy.context.scene.objects if i.select and i.type == 'MESH']
 
 
-def selectActiveMaterialOnly():
+# {mesh pointer: (face count, {material index: list of face indices})}. Dropped when the mesh gets edited.
+material_face_index = dict()
+# meshes whose last update was a selection made from the index, so the index is still valid
+_index_selections = set()
+
+
+def getMaterialFaceIndex(obj):
+	"""
+	Returns the faces of the object's mesh grouped by material. The index is built once per mesh
+	and kept until the mesh is edited. Works in both OBJECT and EDIT mode.
+	:return: dict {material index: list of face indices}. Materials without faces are not included.
+	"""
+	mesh = obj.data
+	key = mesh.as_pointer()
+
+	if obj.mode == 'EDIT':
+		bm = bmesh.from_edit_mesh(mesh)
+		face_count = len(bm.faces)
+	else:
+		bm = None
+		face_count = len(mesh.polygons)
+
+	if key in material_face_index and material_face_index[key][0] == face_count:
+		return material_face_index[key][1]
+
+	if bm:
+		index = dict()
+		for face_index, face in enumerate(bm.faces):
+			index.setdefault(face.material_index, []).append(face_index)
+	else:
+		index = getMaterialFaces(mesh)
+
+	material_face_index[key] = (face_count, index)
+	return index
+
+
+@persistent
+def invalidateMaterialFaceIndex(scene):
+	"""
+	Handler for `scene_update_post`. Drops the material index of the meshes that were edited.
+	"""
+	if not material_face_index or not bpy.data.meshes.is_updated:
+		return
+
+	for mesh in bpy.data.meshes:
+		if mesh.is_updated or mesh.is_updated_data:
+			key = mesh.as_pointer()
+			if key in _index_selections:
+				# it was just our selection
+				_index_selections.discard(key)
+			else:
+				material_face_index.pop(key, None)
+
+
+@persistent
+def clearMaterialFaceIndex(dummy):
+	"""
+	Handler for `load_post`. Pointers of the old file's meshes are meaningless in the new one.
+	"""
+	material_face_index.clear()
+	_index_selections.clear()
+
+
+def selectActiveMaterialOnly(obj=None):
 	"""
-	Selects the verts belonging to active material, deselecting all others.
+	Selects the faces belonging to active material, deselecting all others.
+	Must be called in EDIT mode.
+	:param obj: mesh object. Active object if None.
 	:return:
 	"""
+	obj = obj or bpy.context.object
+	mesh = obj.data
+	faces = getMaterialFaceIndex(obj).get(obj.active_material_index, ())
+
 	bpy.ops.mesh.select_all(action='DESELECT')
-	bpy.ops.object.material_slot_select()
+	bm = bmesh.from_edit_mesh(mesh)
+	bm.faces.ensure_lookup_table()
+	for face_index in faces:
+		bm.faces[face_index].select_set(True)
+	bmesh.update_edit_mesh(mesh, False, False)
+	_index_selections.add(mesh.as_pointer())
 
 
 def selectNeighbourMaterial(context, forward=True):
 	"""
 	Selects vertices belonging to the next (if forward is True) or previous (if False) material in the stack,
-	deselecting all others.
+	deselecting all others. Materials without faces are skipped.
 	:param context:
 	:param forward:
 	:return:
@@ -65,7 +311,17 @@ def selectNeighbourMaterial(context, forward=True):
 	obj = context.object
 
 	am = len(obj.material_slots)  # amount of materials
+	if not am:
+		return
+	index = getMaterialFaceIndex(obj)
 	cur_i = obj.active_material_index
-	cur_i = (cur_i + (1 if forward else -1)) % am
-	obj.active_material_index = cur_i
-	selectActiveMaterialOnly()
+	step = 1 if forward else -1
+	for n in range(1, am + 1):
+		new_i = (cur_i + n * step) % am
+		if index.get(new_i):
+			break
+	else:
+		# no material has faces, just go to the neighbour
+		new_i = (cur_i + step) % am
+	obj.active_material_index = new_i
+	selectActiveMaterialOnly(obj)
@@ -0,0 +1,96 @@
+"""
+Dense access to vertex group weights. A group is read into a float array with the weight of every
+vertex (0 for the vertices not in the group) plus a mask of the vertices in the group, in a single
+pass over the vertices' group memberships, instead of asking the group vertex by vertex and catching
+the errors for non-members. Written back with one `add` per distinct weight and one `remove`.
+"""
+
+import array
+
+from .utils import getNumpy, addWeightsBatched
+
+# memory `readGroups` takes per read vertex and group while collecting the members, in bytes
+GROUP_VERTEX_BYTES = 96
+
+
+def readGroups(mesh, group_indices, indices=None):
+	"""
+	Reads several vertex groups of the mesh in a single pass over the vertices.
+	:param group_indices: indices of the groups (`vertex_group.index`)
+	:param indices: vertices to read, all if None
+	:return: {group index: (weights, mask)}. `weights[i]` is the weight of the i-th read vertex, 0 if it is
+	not in the group, `mask[i]` tells if it is. float32 and bool numpy arrays if available,
+	otherwise `array.array("f")` and `bytearray`.
+	"""
+	vertices = mesh.vertices
+	count = len(vertices) if indices is None else len(indices)
+	found = dict((group_index, ([], [])) for group_index in group_indices)
+
+	for position, vertex in enumerate(vertices if indices is None else (vertices[i] for i in indices)):
+		for element in vertex.groups:
+			lists = found.get(element.group)
+			if lists is not None:
+				lists[0].append(position)
+				lists[1].append(element.weight)
+
+	np = getNumpy()
+	result = dict()
+	for group_index, (positions, values) in found.items():
+		if np is not None:
+			weights = np.zeros(count, dtype=np.float32)
+			mask = np.zeros(count, dtype=bool)
+			weights[positions] = values
+			mask[positions] = True
+		else:
+			weights = array.array("f", bytes(count * 4))
+			mask = bytearray(count)
+			for position, value in zip(positions, values):
+				weights[position] = value
+				mask[position] = 1
+		result[group_index] = (weights, mask)
+	return result
+
+
+def readGroup(vertex_group, indices=None):
+	"""
+	Reads one vertex group, see `readGroups`.
+	:return: tuple (weights, mask)
+	"""
+	return readGroups(vertex_group.id_data.data, [vertex_group.index], indices)[vertex_group.index]
+
+
+def writeGroup(vertex_group, indices, weights, mask=None):
+	"""
+	Sets the weights of given vertices, replacing the old ones. Vertices sharing the same weight are added
+	with a single `vertex_group.add` call, the ones outside of `mask` are removed with a single `remove`.
+	:param indices: vertex indices
+	:param weights: weights for the respective vertices, as returned by `readGroups`
+	:param mask: tells which vertices are in the group, as returned by `readGroups`. All are if None.
+	"""
+	np = getNumpy()
+	if np is not None:
+		indices = np.asarray(indices, dtype=np.int64)
+		weights = np.asarray(weights, dtype=np.float32)
+		if mask is not None:
+			mask = np.asarray(mask, dtype=bool)
+			removed = indices[~mask]
+			if len(removed):
+				vertex_group.remove(removed.tolist())
+			indices = indices[mask]
+			weights = weights[mask]
+		if not len(indices):
+			return
+		values, inverse = np.unique(weights, return_inverse=True)
+		order = np.argsort(inverse, kind="mergesort")
+		starts = np.searchsorted(inverse[order], np.arange(len(values)))
+		for value, batch in zip(values.tolist(), np.split(indices[order], starts[1:])):
+			vertex_group.add(batch.tolist(), value, "REPLACE")
+		return
+
+	if mask is not None:
+		removed = [i for i, member in zip(indices, mask) if not member]
+		if removed:
+			vertex_group.remove(removed)
+		weights = [w for w, member in zip(weights, mask) if member]
+		indices = [i for i, member in zip(indices, mask) if member]
+	addWeightsBatched(vertex_group, indices, weights)